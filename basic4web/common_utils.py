@@ -10,7 +10,10 @@ import zipfile
 from copy import deepcopy
 from datetime import datetime
 
-from bson import ObjectId
+try:
+    from bson import ObjectId
+except ImportError:  # bson ships with the "mongo" extra
+    ObjectId = None
 
 import basic4web.config as base_config
 from basic4web.middleware.logging import logger
@@ -81,7 +84,7 @@ def json_serial(obj):
         return obj.isoformat()
     if isinstance(obj, bytes):
         return base64.b64encode(obj).decode("utf-8")
-    if isinstance(obj, ObjectId):
+    if ObjectId is not None and isinstance(obj, ObjectId):
         return str(obj)
     raise TypeError(f"non-serializable type: {type(obj)}")
 
@@ -7,14 +7,28 @@ _config = {
     'JWT_AUD': 'app',
     'JWT_SECRET_KEY': 'dev',
     'JWT_EXPIRE': 1800,
+    'JWT_CACHE_SIZE': 4096,
+    'JWT_CACHE_TTL': 300,
+    'COUNT_CACHE_TTL': 60,
+    'COUNT_CACHE_SIZE': 4096,
     'LOGLEVEL': 'INFO',
     'CORE_VERSION': 'v0.0.2'
 }
 
+_listeners = []
+
 
 def init(overrides: dict = None):
     if overrides:
         _config.update(overrides)
+        for listener in _listeners:
+            listener()
+
+
+def subscribe(listener):
+    """Register a callable invoked without arguments after every config change."""
+    _listeners.append(listener)
+    return listener
 
 
 def get(key, default=None):
@@ -22,4 +36,4 @@ def get(key, default=None):
 
 
 def has(keys):
-    hasattr(_config, keys)
+    return keys in _config
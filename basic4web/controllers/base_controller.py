@@ -1,48 +1,178 @@
+import time
 import traceback
 from functools import wraps
 
 import jwt
-from flask import jsonify, request, Response
+from flask import abort, current_app, g, jsonify, make_response, request, Response, stream_with_context
 
-import basic4web.config as base_config
-from basic4web.middleware.jwt import jwt_get, jwt_decode
+from basic4web.common_utils import hash_dict
+from basic4web.middleware import authorization
+from basic4web.middleware.jwt import jwt_get, jwt_get_claims
+from basic4web.middleware.metrics import record_phase, timed_phase
+from basic4web.middleware.response_cache import get_response_cache
+from basic4web.repository.loader import BatchLoader
+from basic4web.repository.pagination import count_mode, decode_cursor
 
 
 def get_pagination():
+    """
+    Read pagination from the query string.
+
+    ``page``/``size`` selects offset pagination. ``after``/``size`` selects
+    keyset (cursor) pagination: ``after`` is the opaque ``metadata.next``
+    token of the previous page, empty for the first one. ``count`` selects
+    how total_elements is computed (exact, none, estimated, cached).
+    Invalid values abort the request with a 400 ``response_error``.
+    :return: pagination dict for the DAOs' get_all, or None
+    """
     _pagination = None
-    if "size" in request.args and "page" in request.args:
-        _pagination = {
-            "per_page": int(request.args.get("size")),
-            "page": int(request.args.get("page")),
-        }
+    try:
+        if "size" in request.args and "after" in request.args:
+            after = request.args.get("after")
+            _pagination = {
+                "per_page": int(request.args.get("size")),
+                "after": decode_cursor(after) if after else None,
+            }
+        elif "size" in request.args and "page" in request.args:
+            _pagination = {
+                "per_page": int(request.args.get("size")),
+                "page": int(request.args.get("page")),
+            }
+        if _pagination and "count" in request.args:
+            _pagination["count"] = request.args.get("count")
+            count_mode(_pagination)
+    except ValueError as e:
+        abort(make_response(response_error(msg="Invalid pagination", details=str(e))))
     return _pagination
 
 
-def has_any_authority(authorities=None, _internal=False):
+def request_loader(dao):
+    """
+    Get the request-scoped BatchLoader of a DAO.
+
+    Loaders are kept on flask.g per DAO class and database table/collection
+    (the DAO's count namespace, which includes the connection target), so
+    every get_by_id resolved through them during a request is batched and
+    memoized.
+    :param dao: DAO implementing get_by_ids
+    :return: BatchLoader
+    """
+    loaders = g.get("_loaders")
+    if loaders is None:
+        loaders = g._loaders = {}
+    key = (type(dao), getattr(dao, "_count_namespace", None) or id(dao))
+    loader = loaders.get(key)
+    if loader is None:
+        loader = loaders[key] = BatchLoader(dao)
+    return loader
+
+
+def _check_authorization(policy, _internal, security):
+    if _internal and security["api_key"]:
+        if security["api_key"] == request.headers.get("x-api-key"):
+            return None
+    try:
+        if jwt_get():
+            claims = jwt_get_claims()
+            if policy.allows(claims["authorities"], claims["mask"]):
+                return None
+    except jwt.ExpiredSignatureError:
+        return response_error_401(
+            msg="Expired authorization", details=traceback.format_exc()
+        )
+    except Exception as e2:
+        return response_error_401(msg=str(e2), details=traceback.format_exc())
+    return response_error_403(message="Invalid authorization")
+
+
+def _authorize(policy, _internal):
     def wrapper(fn):
         @wraps(fn)
         def decorator(*args, **kwargs):
-            if not base_config.has("SECURITY_ENABLED") or not base_config.get(
-                    "SECURITY_ENABLED"
-            ):
+            security = authorization.settings()
+            if not security["security_enabled"]:
                 return fn(*args, **kwargs)
 
-            if _internal and base_config.has("API_KEY") and base_config.get("API_KEY"):
-                if base_config.get("API_KEY") == request.headers.get("x-api-key"):
+            started = time.perf_counter()
+            denied = _check_authorization(policy, _internal, security)
+            record_phase("authorization", time.perf_counter() - started)
+            if denied is not None:
+                return denied
+            return fn(*args, **kwargs)
+
+        return decorator
+
+    return wrapper
+
+
+def has_any_authority(authorities=None, _internal=False):
+    return _authorize(authorization.Policy(authorities), _internal)
+
+
+def has_all_authorities(authorities=None, _internal=False):
+    return _authorize(authorization.Policy(authorities, require_all=True), _internal)
+
+
+_UNCACHED_HEADERS = ("content-length", "set-cookie")
+
+
+def cached_response(ttl=60, vary_on_principal=True, tags=None):
+    """
+    Cache the serialized response of a GET view.
+
+    Entries are keyed by endpoint, view args, query args and, optionally, the
+    token subject, and stored in the response cache (in-process LRU plus the
+    optional Redis tier, see ``init_response_cache``). Place it below
+    ``has_any_authority`` so authorization still runs on every request.
+    Hits replay the view's headers (ETag, Cache-Control, ...) except
+    Content-Length and Set-Cookie, and answer a matching If-None-Match with
+    304.
+    :param ttl: Seconds an entry stays valid
+    :param vary_on_principal: Key entries by the token subject
+    :param tags: List of tags, or callable receiving the view kwargs and
+        returning them, used by ``invalidate_tags``
+    """
+
+    def wrapper(fn):
+        @wraps(fn)
+        def decorator(*args, **kwargs):
+            if request.method != "GET":
+                return fn(*args, **kwargs)
+            principal = ""
+            if vary_on_principal and jwt_get():
+                try:
+                    principal = jwt_get_claims()["payload"].get("sub", "")
+                except Exception:
                     return fn(*args, **kwargs)
-            try:
-                token = jwt_get()
-                if token:
-                    payload = jwt_decode(token)
-                    if any(a in payload.get("authorities", []) for a in authorities):
-                        return fn(*args, **kwargs)
-            except jwt.ExpiredSignatureError:
-                return response_error_401(
-                    msg="Expired authorization", details=traceback.format_exc()
+            key = hash_dict(
+                {
+                    "endpoint": request.endpoint,
+                    "view_args": request.view_args,
+                    "args": sorted(request.args.items(multi=True)),
+                    "principal": principal,
+                }
+            )
+            cache = get_response_cache()
+            entry = cache.get(key)
+            if entry is not None:
+                resp = Response(
+                    entry["body"], status=entry["status"], headers=entry.get("headers"), mimetype=entry["mimetype"]
                 )
-            except Exception as e2:
-                return response_error_401(msg=str(e2), details=traceback.format_exc())
-            return response_error_403(message="Invalid authorization")
+                return resp.make_conditional(request)
+
+            resp = make_response(fn(*args, **kwargs))
+            if resp.status_code == 200 and not resp.is_streamed:
+                entry_tags = tags(**kwargs) if callable(tags) else (tags or ())
+                entry = {
+                    "body": resp.get_data(as_text=True),
+                    "status": resp.status_code,
+                    "mimetype": resp.mimetype,
+                    "headers": [
+                        [k, v] for k, v in resp.headers.items() if k.lower() not in _UNCACHED_HEADERS
+                    ],
+                }
+                cache.set(key, entry, ttl, entry_tags)
+            return resp
 
         return decorator
 
@@ -152,20 +282,151 @@ def response_error_parse(err):
     )
 
 
-def response_data_list(o, schema=None):
+def _cache_headers(resp, max_age, private):
+    resp.cache_control.private = private or None
+    resp.cache_control.public = not private or None
+    if max_age:
+        resp.cache_control.max_age = max_age
+    else:
+        resp.cache_control.no_cache = True
+    return resp
+
+
+def _versioned_response(o, schema, version, max_age, private):
+    if request.method not in ("GET", "HEAD"):
+        return jsonify(schema.dump(o) if schema else o)
+    etag = hash_dict(
+        {
+            "version": version,
+            "schema": type(schema).__name__ if schema else None,
+            # the same version backs every filter/page of a listing
+            "args": sorted(request.args.items(multi=True)),
+        }
+    )
+    if request.if_none_match.contains(etag):
+        resp = Response(status=304)
+    else:
+        resp = jsonify(schema.dump(o) if schema else o)
+    resp.set_etag(etag)
+    return _cache_headers(resp, max_age, private)
+
+
+@timed_phase("serialization")
+def response_data_list(o, schema=None, version=None, max_age=0, private=True):
+    if version is not None:
+        return _versioned_response(o, schema, version, max_age, private)
     if schema:
         return jsonify(schema.dump(o)), 200
     else:
         return jsonify(o), 200
 
 
-def response_data(o, schema=None):
+@timed_phase("serialization")
+def response_data(o, schema=None, version=None, max_age=0, private=True):
+    """
+    Serialize a payload as a JSON response.
+
+    :param o: Payload
+    :param schema: Optional marshmallow schema
+    :param version: Optional DAO-supplied version (e.g. updated_at); when
+        given on GET/HEAD, a strong ETag is derived from it and the query
+        args, and a matching If-None-Match is answered with 304 before the
+        payload is serialized
+    :param max_age: Cache-Control max-age, 0 means no-cache (revalidate)
+    :param private: Cache-Control private (True) or public (False)
+    """
+    if version is not None:
+        return _versioned_response(o, schema, version, max_age, private)
     if schema:
         return jsonify(schema.dump(o)), 200
     else:
         return jsonify(o), 200
 
 
+def conditional_response(max_age=0, private=True):
+    """
+    Add a strong ETag computed from the response body to a GET view.
+
+    A request whose If-None-Match matches gets 304 without a body, so
+    clients polling read-mostly endpoints stop re-downloading them.
+    :param max_age: Cache-Control max-age, 0 means no-cache (revalidate)
+    :param private: Cache-Control private (True) or public (False)
+    """
+
+    def wrapper(fn):
+        @wraps(fn)
+        def decorator(*args, **kwargs):
+            resp = make_response(fn(*args, **kwargs))
+            if request.method not in ("GET", "HEAD") or resp.status_code != 200 or resp.is_streamed:
+                return resp
+            if not resp.get_etag()[0]:
+                resp.add_etag()
+            _cache_headers(resp, max_age, private)
+            return resp.make_conditional(request)
+
+        return decorator
+
+    return wrapper
+
+
+def _json_bytes(o):
+    json_provider = current_app.json
+    if hasattr(json_provider, "dumpb"):
+        return json_provider.dumpb(o)
+    return json_provider.dumps(o).encode("utf-8")
+
+
+def response_stream(rows, schema=None, fmt="json", metadata=None, chunk_size=500):
+    """
+    Stream rows from an iterator or cursor without materializing the list.
+
+    Rows are dumped through the schema (if any) and encoded one at a time,
+    and flushed every ``chunk_size`` rows, so memory stays flat regardless
+    of the number of rows.
+    :param rows: Iterable of rows (cursor, generator, DAO iterator); its
+        close() is called when the stream ends or the client disconnects
+    :param schema: Optional marshmallow schema applied to each row
+    :param fmt: "json" for {"data": [...], "metadata": {...}} or "ndjson"
+    :param metadata: Extra metadata merged into the envelope (json only)
+    :param chunk_size: Number of rows encoded per write
+    :return: Streaming Response object
+    """
+    if fmt not in ("json", "ndjson"):
+        raise ValueError(f"unsupported stream format: {fmt}")
+
+    def generate():
+        close = getattr(rows, "close", None)
+        try:
+            total = 0
+            chunk = []
+            if fmt == "json":
+                yield b'{"data":['
+            for row in rows:
+                if schema:
+                    row = schema.dump(row, many=False)
+                if fmt == "json" and total:
+                    chunk.append(b",")
+                chunk.append(_json_bytes(row))
+                if fmt == "ndjson":
+                    chunk.append(b"\n")
+                total += 1
+                if total % chunk_size == 0:
+                    yield b"".join(chunk)
+                    chunk = []
+            if chunk:
+                yield b"".join(chunk)
+            if fmt == "json":
+                _meta = {"total_elements": total, "page": 1, "per_page": total}
+                _meta.update(metadata or {})
+                yield b'],"metadata":' + _json_bytes(_meta) + b"}"
+        finally:
+            if close is not None:
+                close()
+
+    mimetype = "application/json" if fmt == "json" else "application/x-ndjson"
+    return Response(stream_with_context(generate()), status=200, mimetype=mimetype)
+
+
 def response_redirect(url, status_code=302):
     """
     Redirect to a specific URL
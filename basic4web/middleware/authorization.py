@@ -0,0 +1,157 @@
+import hashlib
+
+import basic4web.config as base_config
+
+_settings = {}
+
+
+def refresh_settings():
+    """
+    Snapshot the security related configuration.
+
+    Called on import and after every ``config.init``; the authorization hot
+    path only reads this snapshot and never goes back to the config module.
+
+    Config keys:
+        AUTHORITIES (list): ordered authority names, position = bit in the mask
+        ROLE_HIERARCHY (dict): role -> list of authorities it implies
+    """
+    names = list(base_config.get("AUTHORITIES") or [])
+    bits = {name: 1 << i for i, name in enumerate(names)}
+    hierarchy = _close_hierarchy(base_config.get("ROLE_HIERARCHY") or {})
+    implied_masks = {}
+    for role, implied in hierarchy.items():
+        mask = _mask_of(bits, implied)
+        if role not in bits or mask is None:
+            # the hierarchy cannot be replayed on bits: masks come from the expanded list
+            implied_masks = None
+            break
+        implied_masks[bits[role]] = mask
+    snapshot = {
+        "security_enabled": bool(base_config.get("SECURITY_ENABLED")),
+        "api_key": base_config.get("API_KEY") or None,
+        "bits": bits,
+        "bits_version": hashlib.md5("\n".join(names).encode()).hexdigest()[:8] if names else None,
+        "hierarchy": hierarchy,
+        "implied_masks": implied_masks,
+        # written last: a Policy seeing the new generation also sees the new bits
+        "generation": _settings.get("generation", 0) + 1,
+    }
+    # no clear(): concurrent requests always find every key
+    _settings.update(snapshot)
+
+
+def settings():
+    return _settings
+
+
+def _close_hierarchy(hierarchy):
+    closed = {}
+    for role in hierarchy:
+        seen = set()
+        pending = list(hierarchy.get(role, ()))
+        while pending:
+            a = pending.pop()
+            if a not in seen:
+                seen.add(a)
+                pending.extend(hierarchy.get(a, ()))
+        closed[role] = frozenset(seen)
+    return closed
+
+
+def _mask_of(bits, authorities):
+    mask = 0
+    for a in authorities:
+        bit = bits.get(a)
+        if bit is None:
+            return None
+        mask |= bit
+    return mask
+
+
+def expand_authorities(authorities):
+    """Return the authorities plus everything implied by ROLE_HIERARCHY."""
+    granted = frozenset(authorities or ())
+    hierarchy = _settings["hierarchy"]
+    if not hierarchy:
+        return granted
+    expanded = set(granted)
+    for a in granted:
+        expanded.update(hierarchy.get(a, ()))
+    return frozenset(expanded)
+
+
+def authority_mask_claim(authorities):
+    """
+    Build the compact ``amask`` claim for a token.
+
+    Returns:
+        list: [bits_version, mask] or None when AUTHORITIES is not configured.
+    """
+    if not _settings["bits_version"] or not authorities:
+        return None
+    mask = 0
+    for a in authorities:
+        mask |= _settings["bits"].get(a, 0)
+    return [_settings["bits_version"], mask]
+
+
+def granted_mask(payload, authorities):
+    """
+    Resolve the bitmask granted by a token, hierarchy included.
+
+    The ``amask`` claim is trusted only when it was issued with the current
+    AUTHORITIES table and every ROLE_HIERARCHY entry maps to bits; otherwise
+    the mask is rebuilt from authorities, which must already be expanded.
+    """
+    bits = _settings["bits"]
+    if not bits:
+        return None
+    claim = payload.get("amask")
+    implied_masks = _settings["implied_masks"]
+    if claim and claim[0] == _settings["bits_version"] and implied_masks is not None:
+        mask = claim[1]
+        for bit, implied in implied_masks.items():
+            if mask & bit:
+                mask |= implied
+        return mask
+    mask = 0
+    for a in authorities:
+        mask |= bits.get(a, 0)
+    return mask
+
+
+class Policy:
+    """
+    Authorization rule compiled once at decoration time.
+
+    Matching is a single bit operation when every required authority has a
+    bit in AUTHORITIES and the token mask is known, a frozenset operation
+    otherwise.
+    """
+
+    __slots__ = ("required", "require_all", "mask", "generation")
+
+    def __init__(self, authorities, require_all=False):
+        self.required = frozenset(authorities or ())
+        self.require_all = require_all
+        self._compile()
+
+    def _compile(self):
+        self.mask = _mask_of(_settings["bits"], self.required) if _settings["bits"] else None
+        self.generation = _settings["generation"]
+
+    def allows(self, granted, mask=None):
+        if self.generation != _settings["generation"]:
+            self._compile()
+        if self.mask is not None and mask is not None:
+            if self.require_all:
+                return mask & self.mask == self.mask
+            return mask & self.mask != 0
+        if self.require_all:
+            return self.required <= granted
+        return not self.required.isdisjoint(granted)
+
+
+refresh_settings()
+base_config.subscribe(refresh_settings)
@@ -0,0 +1,85 @@
+import json
+
+from flask.json.provider import DefaultJSONProvider
+
+from basic4web.common_utils import json_serial
+
+try:
+    import orjson
+except ImportError:  # optional accelerator, see extras_require["json"]
+    orjson = None
+
+
+def _default(o):
+    try:
+        return json_serial(o)
+    except TypeError:
+        return DefaultJSONProvider.default(o)
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """
+    Flask JSON provider aware of ``ObjectId``, ``datetime`` and ``bytes``.
+
+    Those types are encoded inline by ``common_utils.json_serial`` during the
+    single encode pass, so payloads no longer need ``deep_date_str`` first.
+    When ``orjson`` is installed it is used for encoding; anything it rejects
+    is retried with the stdlib encoder. Dates and times are passed through to
+    ``default`` so both encoders produce the same output.
+    """
+
+    default = staticmethod(_default)
+    use_orjson = orjson is not None
+
+    def _orjson_option(self, indent=False):
+        option = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+        if self.sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        if indent:
+            option |= orjson.OPT_INDENT_2
+        return option
+
+    def dumpb(self, obj, indent=False):
+        """Serialize to UTF-8 bytes without the str round-trip when possible."""
+        if self.use_orjson:
+            try:
+                return orjson.dumps(obj, default=self.default, option=self._orjson_option(indent))
+            except TypeError:
+                pass
+        kwargs = {"indent": 2} if indent else {"separators": (",", ":")}
+        return self.dumps(obj, **kwargs).encode("utf-8")
+
+    def dumps(self, obj, **kwargs):
+        if self.use_orjson and set(kwargs) <= {"separators", "indent"}:
+            try:
+                return orjson.dumps(
+                    obj, default=self.default, option=self._orjson_option("indent" in kwargs)
+                ).decode("utf-8")
+            except TypeError:
+                pass
+        return super().dumps(obj, **kwargs)
+
+    def loads(self, s, **kwargs):
+        if self.use_orjson and not kwargs:
+            return orjson.loads(s)
+        return json.loads(s, **kwargs)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        indent = (self.compact is None and self._app.debug) or self.compact is False
+        return self._app.response_class(self.dumpb(obj, indent=indent) + b"\n", mimetype=self.mimetype)
+
+
+def init_json_provider(app, provider_class=FastJSONProvider):
+    """
+    Install the basic4web JSON provider on a Flask app.
+
+    Args:
+        app: Flask application
+        provider_class: JSONProvider subclass to install
+
+    Returns:
+        The installed provider instance.
+    """
+    app.json = provider_class(app)
+    return app.json
@@ -1,9 +1,126 @@
+import threading
+import time
+from collections import OrderedDict
+from copy import deepcopy
 from datetime import datetime, timedelta
 
 import jwt
-from flask import request
+from flask import g, request
 
 import basic4web.config as base_config
+from basic4web.middleware.authorization import authority_mask_claim, expand_authorities, granted_mask
+
+
+class TokenCache:
+    """
+    Bounded LRU cache from a raw token to its verified payload.
+
+    Entries are dropped once their ``exp`` claim is reached, so an expired
+    token always falls through to ``jwt.decode`` and raises as usual. The lock
+    is only held for dictionary operations and never across a yield point,
+    which keeps it safe under both native threads and eventlet green threads.
+    """
+
+    def __init__(self, maxsize=4096, ttl=300):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, token):
+        with self._lock:
+            entry = self._entries.get(token)
+            if entry is not None:
+                payload, expires_at = entry
+                if time.time() < expires_at:
+                    self._entries.move_to_end(token)
+                    self.hits += 1
+                    return payload
+                del self._entries[token]
+            self.misses += 1
+            return None
+
+    def put(self, token, payload):
+        if self.maxsize <= 0:
+            return
+        expires_at = payload.get("exp", time.time() + self.ttl)
+        with self._lock:
+            self._entries[token] = (payload, expires_at)
+            self._entries.move_to_end(token)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self):
+        with self._lock:
+            return {
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+
+_token_cache = TokenCache(
+    maxsize=base_config.get("JWT_CACHE_SIZE"),
+    ttl=base_config.get("JWT_CACHE_TTL"),
+)
+
+
+@base_config.subscribe
+def _reset_token_cache():
+    # secret, audience or sizing may have changed: nothing cached is trustworthy
+    _token_cache.maxsize = base_config.get("JWT_CACHE_SIZE")
+    _token_cache.ttl = base_config.get("JWT_CACHE_TTL")
+    _token_cache.clear()
+
+
+def jwt_cache_stats():
+    """
+    Get the verified-token cache counters.
+
+    Returns:
+        dict: size, maxsize, hits and misses of the cache.
+    """
+    return _token_cache.stats()
+
+
+def jwt_cache_clear():
+    _token_cache.clear()
+
+
+def jwt_get_claims():
+    """
+    Get the decoded claims of the current request.
+
+    The token is verified once per request and the result is kept on
+    ``flask.g``, so the authorization decorators, ``jwt_get_principal`` and
+    any other helper share the same payload, principal and authority set.
+    Authorities are expanded with ROLE_HIERARCHY.
+
+    Returns:
+        dict: payload, principal, authorities (frozenset) and authority mask.
+    """
+    claims = g.get("_jwt_claims")
+    if claims is None:
+        payload = jwt_decode(jwt_get())
+        authorities = expand_authorities(payload.get("authorities"))
+        claims = {
+            "payload": payload,
+            # private copy: handlers may mutate the principal, the payload is shared
+            "principal": deepcopy(payload.get("profile", {})),
+            "authorities": authorities,
+            "mask": granted_mask(payload, authorities),
+        }
+        g._jwt_claims = claims
+    return claims
 
 
 def jwt_get_principal():
@@ -13,8 +130,17 @@ def jwt_get_principal():
     Returns:
         dict: The principal of the user.
     """
-    token = jwt_get()
-    return jwt_decode(token).get("profile", {})
+    return jwt_get_claims()["principal"]
+
+
+def jwt_get_authorities():
+    """
+    Get the authorities granted by the JWT token.
+
+    Returns:
+        frozenset: The authorities of the user.
+    """
+    return jwt_get_claims()["authorities"]
 
 
 def jwt_get():
@@ -30,11 +156,21 @@ def jwt_get_refresh():
 
 
 def jwt_decode(token):
-    return jwt.decode(token,
-                      base_config.get('JWT_SECRET_KEY'),
-                      algorithms=["HS256"],
-                      audience=base_config.get('JWT_AUD')
-                      )
+    """
+    Verify a token and return its payload.
+
+    Verified payloads are cached until their ``exp`` claim, so the returned
+    dict is shared between callers and must be treated as read-only.
+    """
+    payload = _token_cache.get(token)
+    if payload is None:
+        payload = jwt.decode(token,
+                             base_config.get('JWT_SECRET_KEY'),
+                             algorithms=["HS256"],
+                             audience=base_config.get('JWT_AUD')
+                             )
+        _token_cache.put(token, payload)
+    return payload
 
 
 def jwt_create_access_token(sub, profile=None, authorities=None, extra_clains=None):
@@ -51,6 +187,9 @@ def jwt_create_access_token(sub, profile=None, authorities=None, extra_clains=No
         "authorities": authorities,
         "aud": base_config.get('JWT_AUD'),
     }
+    amask = authority_mask_claim(authorities)
+    if amask:
+        payload["amask"] = amask
     if extra_clains:
         payload.update(extra_clains)
     return jwt.encode(payload, base_config.get('JWT_SECRET_KEY'), algorithm="HS256")
@@ -0,0 +1,181 @@
+import threading
+import time
+from bisect import bisect_left
+from functools import wraps
+
+from flask import Response, g, request
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Histogram:
+    """Fixed-bucket histogram; ``observe`` is a bisect plus two increments."""
+
+    __slots__ = ("buckets", "counts", "sum")
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+
+    def snapshot(self):
+        return list(self.counts), self.sum
+
+
+class Metrics:
+    """
+    Flask extension recording per-endpoint request metrics.
+
+    Records request counts by status, latency histograms and the time spent
+    in the authorization and serialization phases of ``base_controller``,
+    and exposes them in Prometheus text format. Updates take a single lock
+    for a few dictionary operations and never block while holding it, which
+    keeps them cheap under native threads and eventlet alike.
+
+    Attributes:
+        path (str): URL of the metrics endpoint
+        buckets (tuple): histogram upper bounds in seconds
+    """
+
+    def __init__(self, app=None, path="/metrics", buckets=DEFAULT_BUCKETS, authorities=None):
+        self.path = path
+        self.buckets = tuple(sorted(buckets))
+        self.authorities = authorities
+        self._requests = {}
+        self._latency = {}
+        self._phases = {}
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.before_request(self._before_request)
+        app.after_request(self._after_request)
+        view = self.render
+        if self.authorities:
+            from basic4web.controllers.base_controller import has_any_authority
+
+            view = has_any_authority(self.authorities, _internal=True)(view)
+        app.add_url_rule(self.path, endpoint="basic4web_metrics", view_func=view)
+        app.extensions["basic4web_metrics"] = self
+        return self
+
+    def _before_request(self):
+        g._metrics_started = time.perf_counter()
+        g._metrics_phases = {}
+
+    def _after_request(self, response):
+        started = g.pop("_metrics_started", None)
+        if started is None:
+            return response
+        elapsed = time.perf_counter() - started
+        self.observe(
+            request.endpoint or "unmatched",
+            request.method,
+            response.status_code,
+            elapsed,
+            g.pop("_metrics_phases", None),
+        )
+        return response
+
+    def observe(self, endpoint, method, status, elapsed, phases=None):
+        key = (endpoint, method)
+        with self._lock:
+            count_key = (endpoint, method, status)
+            self._requests[count_key] = self._requests.get(count_key, 0) + 1
+            histogram = self._latency.get(key)
+            if histogram is None:
+                histogram = self._latency[key] = Histogram(self.buckets)
+            histogram.observe(elapsed)
+            if phases:
+                for phase, seconds in phases.items():
+                    phase_key = (phase, endpoint)
+                    histogram = self._phases.get(phase_key)
+                    if histogram is None:
+                        histogram = self._phases[phase_key] = Histogram(self.buckets)
+                    histogram.observe(seconds)
+
+    def render(self):
+        return Response(self.exposition(), mimetype="text/plain; version=0.0.4")
+
+    def exposition(self):
+        with self._lock:
+            requests = dict(self._requests)
+            latency = {k: h.snapshot() for k, h in self._latency.items()}
+            phases = {k: h.snapshot() for k, h in self._phases.items()}
+
+        lines = [
+            "# HELP b4w_http_requests_total Requests by endpoint, method and status.",
+            "# TYPE b4w_http_requests_total counter",
+        ]
+        for (endpoint, method, status), count in sorted(requests.items()):
+            labels = _labels(endpoint=endpoint, method=method, status=status)
+            lines.append(f"b4w_http_requests_total{{{labels}}} {count}")
+
+        lines += [
+            "# HELP b4w_http_request_duration_seconds Request latency by endpoint and method.",
+            "# TYPE b4w_http_request_duration_seconds histogram",
+        ]
+        for (endpoint, method), snapshot in sorted(latency.items()):
+            lines += self._histogram_lines(
+                "b4w_http_request_duration_seconds", snapshot, endpoint=endpoint, method=method
+            )
+
+        lines += [
+            "# HELP b4w_phase_duration_seconds Time spent in authorization and serialization.",
+            "# TYPE b4w_phase_duration_seconds histogram",
+        ]
+        for (phase, endpoint), snapshot in sorted(phases.items()):
+            lines += self._histogram_lines(
+                "b4w_phase_duration_seconds", snapshot, phase=phase, endpoint=endpoint
+            )
+        return "\n".join(lines) + "\n"
+
+    def _histogram_lines(self, name, snapshot, **labels):
+        counts, total = snapshot
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets, counts):
+            cumulative += count
+            lines.append(f"{name}_bucket{{{_labels(**labels, le=repr(float(bound)))}}} {cumulative}")
+        cumulative += counts[-1]
+        lines.append(f"{name}_bucket{{{_labels(**labels, le='+Inf')}}} {cumulative}")
+        lines.append(f"{name}_sum{{{_labels(**labels)}}} {total}")
+        lines.append(f"{name}_count{{{_labels(**labels)}}} {cumulative}")
+        return lines
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(**labels):
+    return ",".join(f'{k}="{_escape(v)}"' for k, v in labels.items())
+
+
+def record_phase(phase, seconds):
+    """Add time spent in a phase to the current request, if metrics are enabled."""
+    phases = g.get("_metrics_phases")
+    if phases is not None:
+        phases[phase] = phases.get(phase, 0.0) + seconds
+
+
+def timed_phase(phase):
+    """Decorator recording the wrapped call duration with ``record_phase``."""
+
+    def wrapper(fn):
+        @wraps(fn)
+        def decorator(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                record_phase(phase, time.perf_counter() - started)
+
+        return decorator
+
+    return wrapper
@@ -0,0 +1,104 @@
+import cProfile
+import os
+import random
+import re
+import time
+
+from flask import g, request
+
+import basic4web.config as base_config
+from basic4web.middleware.authorization import Policy
+from basic4web.middleware.jwt import jwt_get, jwt_get_claims
+from basic4web.middleware.logging import logger
+
+
+class RequestProfiler:
+    """
+    Opt-in cProfile hook for Flask requests.
+
+    A request is profiled when it is sampled (``sample_rate``) or when it
+    carries ``header`` and its token holds one of ``authorities``. The token
+    is always checked, even with SECURITY_ENABLED off, and a request without
+    a valid token is never profiled through the header. Each profile is written as a pstats file
+    to ``<directory>/<endpoint>/<timestamp>-<pid>.pstats``; open it with
+    ``python -m pstats`` or snakeviz.
+
+    When neither sampling nor the header gate is configured, no hook is
+    registered at all, so a disabled profiler costs nothing per request.
+
+    Config keys (used when the matching argument is None):
+        PROFILE_DIR, PROFILE_SAMPLE_RATE, PROFILE_AUTHORITIES
+    """
+
+    def __init__(self, app=None, directory=None, sample_rate=None, header="X-Profile", authorities=None):
+        self.directory = directory or base_config.get("PROFILE_DIR", "/tmp/basic4web-profiles")
+        self.sample_rate = sample_rate if sample_rate is not None else base_config.get("PROFILE_SAMPLE_RATE", 0.0)
+        self.header = header
+        self.authorities = authorities if authorities is not None else base_config.get("PROFILE_AUTHORITIES")
+        self._policy = None
+        if app is not None:
+            self.init_app(app)
+
+    @property
+    def enabled(self):
+        return self.sample_rate > 0 or bool(self.authorities)
+
+    def init_app(self, app):
+        if not self.enabled:
+            return self
+        if self.authorities:
+            self._policy = Policy(self.authorities)
+        app.before_request(self._before_request)
+        app.after_request(self._after_request)
+        app.teardown_request(self._teardown_request)
+        app.extensions["basic4web_profiler"] = self
+        return self
+
+    def _wants_profile(self):
+        if self.sample_rate > 0 and random.random() < self.sample_rate:
+            return True
+        return self._policy is not None and self.header in request.headers and self._allowed()
+
+    def _allowed(self):
+        if not jwt_get():
+            return False
+        try:
+            claims = jwt_get_claims()
+        except Exception as e:
+            logger.debug(f"profile header ignored: {e}")
+            return False
+        return self._policy.allows(claims["authorities"], claims["mask"])
+
+    def _before_request(self):
+        if not self._wants_profile():
+            return
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:
+            # another request on this thread (eventlet) is already being profiled
+            return
+        g._profiler = profiler
+
+    def _after_request(self, response):
+        profiler = g.pop("_profiler", None)
+        if profiler is not None:
+            profiler.disable()
+            self._dump(profiler)
+        return response
+
+    def _teardown_request(self, exc=None):
+        profiler = g.pop("_profiler", None)
+        if profiler is not None:
+            profiler.disable()
+
+    def _dump(self, profiler):
+        endpoint = re.sub(r"[^A-Za-z0-9_.-]", "_", request.endpoint or "unmatched")
+        target = os.path.join(self.directory, endpoint)
+        try:
+            os.makedirs(target, exist_ok=True)
+            path = os.path.join(target, f"{int(time.time() * 1000)}-{os.getpid()}.pstats")
+            profiler.dump_stats(path)
+            logger.info(f"request profile written to {path}")
+        except OSError as e:
+            logger.error(f"could not write request profile: {e}")
@@ -0,0 +1,166 @@
+import json
+import threading
+import time
+from collections import OrderedDict
+
+from basic4web.middleware.logging import logger
+
+
+class ResponseCache:
+    """
+    Two-tier cache for serialized responses.
+
+    The first tier is an in-process LRU; the optional second tier is a
+    ``RedisDAO`` shared by every worker. Entries can carry tags, and
+    ``invalidate`` drops every entry of a tag from both tiers.
+
+    With Redis, every tag has a generation counter that ``invalidate``
+    increments. Entries record the generations of their tags when stored, and
+    a local hit on a tagged entry is only served while they are unchanged, so
+    an invalidation in one worker is seen by the LRU of every other worker.
+
+    Attributes:
+        maxsize (int): maximum number of entries kept in process
+        redis: connected RedisDAO used as shared tier, or None
+        prefix (str): key prefix used in Redis
+    """
+
+    def __init__(self, maxsize=1024, redis=None, prefix="b4w:rc:"):
+        self.maxsize = maxsize
+        self.redis = redis
+        self.prefix = prefix
+        self._entries = OrderedDict()
+        self._tags = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        now = time.time()
+        with self._lock:
+            item = self._entries.get(key)
+            if item is not None and item[0] <= now:
+                self._drop(key)
+                item = None
+            elif item is not None:
+                self._entries.move_to_end(key)
+        if self.redis is None:
+            return item[1] if item is not None else None
+        try:
+            if item is not None:
+                if not item[2] or self._generations(item[2]) == item[3]:
+                    return item[1]
+                with self._lock:
+                    if self._entries.get(key) is item:
+                        self._drop(key)
+            raw = self.redis.get_by_id(self.prefix + key)
+            if raw is None:
+                return None
+            stored = json.loads(raw)
+            if stored["tags"] and self._generations(stored["tags"]) != stored.get("generations"):
+                return None
+            self._store_local(key, stored["entry"], stored["expires_at"], stored["tags"], stored.get("generations"))
+            return stored["entry"]
+        except Exception as e:
+            logger.warning(f"response cache redis read failed: {e}")
+            return None
+
+    def set(self, key, entry, ttl, tags=()):
+        expires_at = time.time() + ttl
+        tags = list(tags)
+        if self.redis is None:
+            self._store_local(key, entry, expires_at, tags)
+            return
+        try:
+            generations = self._generations(tags) if tags else []
+            self._store_local(key, entry, expires_at, tags, generations)
+            self.redis.persist(
+                self.prefix + key,
+                json.dumps({"entry": entry, "expires_at": expires_at, "tags": tags, "generations": generations}),
+                expire=ttl,
+            )
+            for tag in tags:
+                self._add_to_tag(f"{self.prefix}tag:{tag}", key, ttl)
+        except Exception as e:
+            logger.warning(f"response cache redis write failed: {e}")
+
+    def invalidate(self, *tags):
+        with self._lock:
+            for tag in tags:
+                for key in list(self._tags.get(tag, ())):
+                    self._drop(key)
+        if self.redis is None:
+            return
+        try:
+            for tag in tags:
+                self.redis.conn.incr(f"{self.prefix}gen:{tag}")
+                tag_key = f"{self.prefix}tag:{tag}"
+                keys = self.redis.conn.smembers(tag_key)
+                if keys:
+                    self.redis.conn.delete(*[self.prefix + k for k in keys])
+                self.redis.delete(tag_key)
+        except Exception as e:
+            logger.warning(f"response cache redis invalidation failed: {e}")
+
+    def _generations(self, tags):
+        return self.redis.get_by_ids([f"{self.prefix}gen:{tag}" for tag in tags])
+
+    def _add_to_tag(self, tag_key, key, ttl):
+        # the tag set lives as long as its longest-lived entry
+        pipe = self.redis.conn.pipeline()
+        pipe.sadd(tag_key, key)
+        pipe.ttl(tag_key)
+        _, remaining = pipe.execute()
+        if remaining < ttl:
+            self.redis.conn.expire(tag_key, ttl)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._tags.clear()
+
+    def _store_local(self, key, entry, expires_at, tags, generations=None):
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+            self._entries[key] = (expires_at, entry, tags, generations)
+            for tag in tags:
+                self._tags.setdefault(tag, set()).add(key)
+            while len(self._entries) > self.maxsize:
+                self._drop(next(iter(self._entries)))
+
+    def _drop(self, key):
+        # caller holds the lock
+        tags = self._entries.pop(key)[2]
+        for tag in tags:
+            keys = self._tags.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tags[tag]
+
+
+_cache = ResponseCache()
+
+
+def init_response_cache(maxsize=1024, redis=None, prefix="b4w:rc:"):
+    """
+    Configure the process-wide response cache.
+
+    Args:
+        maxsize (int): in-process LRU size
+        redis: connected RedisDAO for the shared tier (multi-worker deployments)
+        prefix (str): key prefix used in Redis
+
+    Returns:
+        ResponseCache: the configured cache
+    """
+    global _cache
+    _cache = ResponseCache(maxsize=maxsize, redis=redis, prefix=prefix)
+    return _cache
+
+
+def get_response_cache():
+    return _cache
+
+
+def invalidate_tags(*tags):
+    _cache.invalidate(*tags)
@@ -0,0 +1,73 @@
+class Deferred:
+    """Handle returned by ``BatchLoader.load``; ``get()`` resolves it."""
+
+    __slots__ = ("_loader", "_key", "_id")
+
+    def __init__(self, loader, key, _id):
+        self._loader = loader
+        self._key = key
+        self._id = _id
+
+    def get(self):
+        return self._loader._resolve(self._key, self._id)
+
+
+class BatchLoader:
+    """
+    DataLoader-style batching of ``get_by_id`` calls over a DAO.
+
+    ``load`` only queues the id; the first ``get()`` on any pending handle
+    fetches every queued id with a single ``dao.get_by_ids`` call. Results
+    are memoized for the lifetime of the loader (one request, see
+    ``base_controller.request_loader``), so returned rows are shared and
+    should not be mutated.
+
+    Example:
+        refs = [loader.load(r["owner_id"]) for r in rows]
+        for r, ref in zip(rows, refs):
+            r["owner"] = ref.get()
+    """
+
+    def __init__(self, dao):
+        self.dao = dao
+        self._cache = {}
+        self._pending = {}
+
+    def load(self, _id):
+        key = str(_id)
+        if key not in self._cache:
+            self._pending.setdefault(key, _id)
+        return Deferred(self, key, _id)
+
+    def load_many(self, ids):
+        refs = [self.load(_id) for _id in ids]
+        return [ref.get() for ref in refs]
+
+    def get(self, _id):
+        return self.load(_id).get()
+
+    def prime(self, _id, value):
+        self._cache[str(_id)] = value
+
+    def clear(self, _id=None):
+        if _id is None:
+            self._cache.clear()
+        else:
+            self._cache.pop(str(_id), None)
+
+    def dispatch(self):
+        if not self._pending:
+            return
+        keys = list(self._pending)
+        ids = list(self._pending.values())
+        self._pending = {}
+        for key, value in zip(keys, self.dao.get_by_ids(ids)):
+            self._cache[key] = value
+
+    def _resolve(self, key, _id):
+        if key not in self._cache:
+            if key not in self._pending:
+                # cleared after load(): queue it again
+                self._pending[key] = _id
+            self.dispatch()
+        return self._cache.get(key)
@@ -1,40 +1,194 @@
+import gzip
 import json
-from typing import Any, Dict, Optional, Union
+import os
+import threading
+from contextlib import contextmanager
+from typing import Any, Dict, List, Optional, Union
 
+import bson
 import pymongo
-from bson import ObjectId
-from marshmallow import EXCLUDE, Schema, fields
-from pymongo.errors import PyMongoError
-
+from bson import ObjectId, json_util
+from bson.codec_options import CodecOptions
+from bson.raw_bson import RawBSONDocument
+from marshmallow import Schema, fields
+from pymongo import DeleteOne, IndexModel, InsertOne, UpdateOne
+from pymongo.errors import BulkWriteError, PyMongoError
+
+import basic4web.config as base_config
 from basic4web.middleware.logging import logger
+from basic4web.repository.pagination import (
+    PageMetaSchema,
+    count_cache,
+    count_mode,
+    is_keyset,
+    keyset_metadata,
+    keyset_page,
+    resolve_total,
+    trim_page,
+)
+
+
+class ClientRegistry:
+    """
+    Process-wide registry of shared MongoDB clients.
 
+    One client (and therefore one connection pool and one set of monitoring
+    threads) is created per URL and option set; DAOs acquire it on connect
+    and release it on close. Idle clients are kept open for the next DAO
+    unless MONGO_CLIENT_LINGER is False. Clients inherited through fork()
+    are discarded in the child, as required by pymongo.
+    """
 
-class PageMetaSchema(Schema):
-    class Meta:
-        unknown = EXCLUDE
+    def __init__(self, factory):
+        self._factory = factory
+        self._clients = {}
+        self._lock = threading.Lock()
+        self._pid = os.getpid()
+
+    def acquire(self, url, **options):
+        key = (str(url), tuple(sorted(options.items())))
+        with self._lock:
+            self._check_pid()
+            entry = self._clients.get(key)
+            if entry is None:
+                entry = self._clients[key] = [self._factory(str(url), **options), 0]
+            entry[1] += 1
+            return entry[0]
+
+    def release(self, client):
+        with self._lock:
+            self._check_pid()
+            for key, entry in self._clients.items():
+                if entry[0] is client:
+                    entry[1] -= 1
+                    if entry[1] <= 0 and not base_config.get("MONGO_CLIENT_LINGER", True):
+                        del self._clients[key]
+                        return client
+                    return None
+        return None
 
-    total_elements = fields.Integer()
-    page = fields.Integer()
-    per_page = fields.Integer()
+    def close_all(self):
+        """Close every registered client (application shutdown)."""
+        for client in self._drain():
+            client.close()
+
+    def _drain(self):
+        with self._lock:
+            clients = [entry[0] for entry in self._clients.values()]
+            self._clients.clear()
+        return clients
+
+    def stats(self):
+        with self._lock:
+            return [
+                {"host": key[0].rsplit("@", 1)[-1], "options": dict(key[1]), "refs": entry[1]}
+                for key, entry in self._clients.items()
+            ]
+
+    def _check_pid(self):
+        if self._pid != os.getpid():
+            self._reset()
+
+    def _reset(self):
+        # sockets and monitor threads belong to the parent: never reuse or close them
+        self._clients = {}
+        self._lock = threading.Lock()
+        self._pid = os.getpid()
+
+
+client_registry = ClientRegistry(pymongo.MongoClient)
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=client_registry._reset)
+
+_schemas = {}
+_ensured_indexes = set()
+_ensured_lock = threading.Lock()
+
+
+def _schema_pair(schema):
+    # pagination schema classes are built once per schema class, not per DAO
+    pair = _schemas.get(schema)
+    if pair is None:
+        page_class = type(
+            "pagination",
+            (Schema,),
+            {
+                "metadata": fields.Nested(PageMetaSchema, many=False),
+                "data": fields.Nested(schema, many=True),
+            },
+        )
+        pair = _schemas[schema] = (page_class(), schema())
+    return pair
 
 
-class MongoDAO:
-    """
-    Base class for MongoDB data access.
+def _has_collscan(plan):
+    if isinstance(plan, dict):
+        if plan.get("stage") == "COLLSCAN":
+            return True
+        return any(_has_collscan(v) for v in plan.values())
+    if isinstance(plan, list):
+        return any(_has_collscan(v) for v in plan)
+    return False
+
+
+@contextmanager
+def _open_stream(target, mode, compress):
+    if isinstance(target, (str, os.PathLike)):
+        if compress is None:
+            compress = str(target).endswith(".gz")
+        f = gzip.open(target, mode) if compress else open(target, mode)
+        try:
+            yield f
+        finally:
+            f.close()
+    elif compress:
+        with gzip.GzipFile(fileobj=target, mode=mode) as f:
+            yield f
+    else:
+        yield target
 
-    This class provides an abstract interface for basic CRUD operations
-    and additional functionalities like pagination, data export and import.
 
-    Attributes:
-        __DB_NAME__ (str): MongoDB database name
-        database: MongoDB database instance
-        collection_name (str): Collection name
-        collection: MongoDB collection reference
-        schema: Marshmallow schema for validation and serialization
+STREAM_FORMATS = ("ndjson", "bson")
+
+
+def _export_record(doc, fmt):
+    if fmt == "bson":
+        return doc.raw
+    return json_util.dumps(doc, json_options=json_util.CANONICAL_JSON_OPTIONS).encode("utf-8") + b"\n"
+
+
+def _import_records(f, fmt):
+    if fmt not in STREAM_FORMATS:
+        raise ValueError(f"unsupported import format: {fmt}")
+    if fmt == "bson":
+        return bson.decode_file_iter(f, codec_options=CodecOptions(document_class=RawBSONDocument))
+    return (json_util.loads(line) for line in f if line.strip())
+
+
+def _count_import_errors(result, e):
+    result["inserted"] += e.details.get("nInserted", 0)
+    result["errors"] += len(e.details.get("writeErrors", []))
+
+
+class MongoDAOMixin:
     """
+    I/O-free parts shared by MongoDAO and AsyncMongoDAO.
+
+    Holds the configuration set by __init__ and builds pipelines, queries,
+    projections, bulk requests and result documents; the concrete classes
+    run them with a blocking or an async client. Subclasses define
+    ``registry`` and ``_connect_on_init``.
+    """
+
+    INDEXES: List[Dict[str, Any]] = []
 
     def __init__(
-            self, url: object, collection_name: str, schema: Optional = None, database: object = "app"
+            self,
+            url: object,
+            collection_name: str,
+            schema: Optional = None,
+            database: object = "app",
+            client_options: Optional[Dict[str, Any]] = None,
     ) -> None:
         """
         Initializes the DAO with the specified collection and schema.
@@ -42,60 +196,71 @@ class MongoDAO:
         Args:
             collection_name (str): MongoDB collection name
             schema (Optional[Schema]): Marshmallow schema for validation
+            client_options (Optional[dict]): MongoClient options overriding the
+                pool defaults (MONGO_MAX_POOL_SIZE, MONGO_MIN_POOL_SIZE,
+                MONGO_MAX_IDLE_TIME_MS); DAOs with the same URL and options
+                share one client
         """
         self.collection = None
         self.__DB_NAME__ = database
         self.__mongo_url = url
         self.collection_name = collection_name
         self.client = None
+        self.client_options = {
+            "maxPoolSize": base_config.get("MONGO_MAX_POOL_SIZE", 100),
+            "minPoolSize": base_config.get("MONGO_MIN_POOL_SIZE", 1),
+            "maxIdleTimeMS": base_config.get("MONGO_MAX_IDLE_TIME_MS", 10000),
+        }
+        self.client_options.update(client_options or {})
+        self.schema = None
+        self.pageSchema = None
         if schema:
-            page_class = type(
-                "pagination",
-                (Schema,),
-                {
-                    "metadata": fields.Nested(PageMetaSchema, many=False),
-                    "data": fields.Nested(schema, many=True),
-                },
-            )
-            self.pageSchema = page_class()
-            self.schema = schema()
-        self.connect()
-
-    def connect(self) -> None:
-        """Establish connection to MongoDB."""
-        if not self.client:
-            self.client = pymongo.MongoClient(
-                str(self.__mongo_url),
-                maxPoolSize=10,
-                minPoolSize=1,
-                maxIdleTimeMS=10000
-            )
-            self.collection = self.client[f"{self.__DB_NAME__}"][self.collection_name]
-
-    def is_connected(self) -> bool:
-        """Check if the connection to MongoDB is established and credentials are valid."""
-        if self.client is None:
-            return False
-        try:
-            self.client.admin.command("ping")
-            return True
-        except Exception:
-            return False
-
-    def close(self) -> None:
-        """Close the connection to MongoDB."""
-        if self.client:
-            self.client.close()
-            self.client = None
-
-    def __enter__(self):
-        """Context manager entry."""
-        self.connect()
-        return self
-
-    def __exit__(self, exc_type, exc_val, exc_tb):
-        """Context manager exit."""
-        self.close()
+            self.pageSchema, self.schema = _schema_pair(schema)
+        self._connect_on_init()
+
+    def _acquire(self):
+        self.client = self.registry.acquire(self.__mongo_url, **self.client_options)
+        self.collection = self.client[f"{self.__DB_NAME__}"][self.collection_name]
+
+    def _index_key(self):
+        return str(self.__mongo_url), self.__DB_NAME__, self.collection_name
+
+    def _index_models(self):
+        models = []
+        for spec in self.INDEXES:
+            spec = dict(spec)
+            keys = spec.pop("keys")
+            if isinstance(keys, str):
+                keys = [(keys, pymongo.ASCENDING)]
+            models.append(IndexModel(keys, **spec))
+        return models
+
+    def _claim_indexes(self, force):
+        # the key to ensure, or None when another DAO already did
+        key = self._index_key()
+        with _ensured_lock:
+            if key in _ensured_indexes and not force:
+                return None
+            _ensured_indexes.add(key)
+        return key
+
+    def _unclaim_indexes(self, key):
+        with _ensured_lock:
+            _ensured_indexes.discard(key)
+
+    def _report_plan(self, plan, mode, query):
+        if _has_collscan(plan):
+            msg = f"COLLSCAN on {self.collection_name} for {query}"
+            if mode == "raise":
+                raise RuntimeError(msg)
+            logger.warning(msg)
+
+    def _export_collection(self, fmt):
+        if fmt not in STREAM_FORMATS:
+            raise ValueError(f"unsupported export format: {fmt}")
+        if fmt == "bson":
+            return self.collection.with_options(codec_options=CodecOptions(document_class=RawBSONDocument))
+        return self.collection
 
     def json_load(self, json_data):
         if self.schema:
@@ -115,13 +280,20 @@ class MongoDAO:
             vo.update({"_id": str(vo["_id"])})
         return vo
 
-    def _fetch_all(self, rs, pagination=None):
+    def _fetch_all(self, rs, pagination=None, total=None):
         rows = rs.get("data", [])
         if pagination:
-            _meta = rs.get("pagination")
-            if not _meta or len(_meta) == 0:
-                _meta = [{"total": 0}]
-            pagination.update({"total_elements": _meta[0].get("total", 0)})
+            mode = count_mode(pagination)
+            if mode == "exact":
+                _meta = rs.get("pagination")
+                if not _meta or len(_meta) == 0:
+                    _meta = [{"total": 0}]
+                pagination.update({"total_elements": _meta[0].get("total", 0)})
+            elif mode == "none":
+                rows, has_next = trim_page(rows, pagination["per_page"])
+                pagination.update({"has_next": has_next})
+            else:
+                pagination.update({"total_elements": total})
         else:
             te = len(rows)
             pagination = {"total_elements": te, "page": 1, "per_page": te}
@@ -135,58 +307,328 @@ class MongoDAO:
             }
         )
 
-    def get_all(self, pagination=None, filters=None):
+    @property
+    def _count_namespace(self):
+        return f"mongo:{self.__mongo_url}/{self.__DB_NAME__}.{self.collection_name}"
+
+    def _match(self, filters):
+        match = dict()
+        for f in filters or ():
+            match.update(f)
+        return match
+
+    def _projection(self, projection, required=()):
+        """
+        Normalizes a projection argument into a MongoDB projection document.
+
+        Args:
+            projection: None (whole documents), True (fields of the DAO
+                schema), a list of field names or a projection dict
+            required: fields that must be kept (e.g. the keyset sort field)
+
+        Returns:
+            Optional[dict]: projection document or None
+        """
+        if projection is None or projection is False:
+            return None
+        if projection is True:
+            if not self.schema:
+                raise ValueError("schema projection requested but the DAO has no schema")
+            projection = [f.attribute or name for name, f in self.schema.fields.items()]
+        if not isinstance(projection, dict):
+            projection = {k: 1 for k in projection}
+        if required and all(projection.values()):
+            projection = dict(projection)
+            for k in required:
+                projection[k] = 1
+        return projection
+
+    def _all_pipeline(self, pagination, filters, projection):
         query = []
         if pagination:
-            query.append(
-                {
-                    "$facet": {
-                        "data": [
-                            {
-                                "$skip": (
-                                        (pagination["page"] - 1) * pagination["per_page"]
-                                )
-                            },
-                            {"$limit": pagination["per_page"]},
-                        ],
-                        "pagination": [{"$count": "total"}],
-                    }
-                }
-            )
+            mode = count_mode(pagination)
+            facet = {
+                "data": [
+                    {
+                        "$skip": (
+                                (pagination["page"] - 1) * pagination["per_page"]
+                        )
+                    },
+                    {"$limit": pagination["per_page"] + (1 if mode == "none" else 0)},
+                ],
+            }
+            if mode == "exact":
+                facet["pagination"] = [{"$count": "total"}]
+            query.append({"$facet": facet})
         else:
             query.append({"$facet": {"data": []}})
 
+        project = self._projection(projection)
+        if project:
+            query.insert(0, {"$project": project})
+        match = self._match(filters)
         if filters:
-            query.insert(0, {"$match": dict()})
-            for f in filters:
-                query[0]["$match"].update(f)
+            query.insert(0, {"$match": match})
 
         logger.debug(query)
+        return query, match
+
+    def _keyset_query(self, pagination, filters, sort_key):
+        column = sort_key.lstrip("-")
+        descending = sort_key.startswith("-")
+        op = "$lt" if descending else "$gt"
+        direction = pymongo.DESCENDING if descending else pymongo.ASCENDING
+        after = pagination.get("after")
+
+        match = self._match(filters)
+        query = match
+        if after is not None:
+            if column == "_id":
+                cond = {"_id": {op: after[-1]}}
+            else:
+                cond = {"$or": [{column: {op: after[0]}}, {column: after[0], "_id": {op: after[-1]}}]}
+            query = {"$and": [match, cond]} if match else cond
+        sort = [("_id", direction)]
+        if column != "_id":
+            sort.insert(0, (column, direction))
+
+        logger.debug(query)
+        return match, query, sort, column
+
+    def _keyset_result(self, rows, pagination, column, total):
+        rows, next_token = keyset_page(rows, pagination["per_page"], column, "_id")
+        for r in rows:
+            self._to_dict(r)
+        metadata = keyset_metadata(pagination, next_token)
+        if total is not None:
+            metadata["total_elements"] = total
+        return {"metadata": metadata, "data": rows}
+
+    def _bulk_request(self, operation):
+        op = operation.get("op")
+        doc = operation.get("doc")
+        if op == "insert":
+            self._from_dict(doc)
+            doc.setdefault("_id", ObjectId())
+            return InsertOne(doc), doc["_id"]
+        _id = operation.get("_id")
+        if _id is not None and not isinstance(_id, ObjectId):
+            _id = ObjectId(_id)
+        if doc:
+            doc.pop("_id", None)
+        if op == "update":
+            return UpdateOne({"_id": _id}, {"$set": doc}), _id
+        if op == "upsert":
+            query = operation.get("filter") or {"_id": _id}
+            return UpdateOne(query, {"$set": doc}, upsert=True), _id
+        if op == "delete":
+            return DeleteOne({"_id": _id}), _id
+        raise ValueError(f"unsupported bulk operation: {op}")
+
+    def _bulk_results(self, requests, results, errors, upserted):
+        base = len(results)
+        for i, (_, _id, op) in enumerate(requests):
+            _id = upserted.get(i, _id)
+            results.append(
+                {
+                    "index": base + i,
+                    "op": op,
+                    "ok": i not in errors,
+                    "_id": str(_id) if _id is not None else None,
+                    "error": errors.get(i),
+                }
+            )
+
+
+class MongoDAO(MongoDAOMixin):
+    """
+    Base class for MongoDB data access.
+
+    This class provides an abstract interface for basic CRUD operations
+    and additional functionalities like pagination, data export and import.
+
+    Attributes:
+        __DB_NAME__ (str): MongoDB database name
+        database: MongoDB database instance
+        collection_name (str): Collection name
+        collection: MongoDB collection reference
+        schema: Marshmallow schema for validation and serialization
+        INDEXES (list): index declarations ensured once per process, e.g.
+            {"keys": "name", "unique": True},
+            {"keys": [("owner", 1), ("created_at", -1)]},
+            {"keys": "created_at", "expireAfterSeconds": 3600}
+            Any other key is passed to pymongo.IndexModel.
+    """
+
+    registry = client_registry
+
+    def _connect_on_init(self):
+        self.connect()
+
+    def connect(self) -> None:
+        """Acquire the shared client for this URL from the registry."""
+        if not self.client:
+            self._acquire()
+            if self.INDEXES and base_config.get("MONGO_ENSURE_INDEXES", True):
+                self.ensure_indexes()
+
+    def ensure_indexes(self, force: bool = False) -> None:
+        """
+        Creates the declared INDEXES; a no-op for indexes that already exist.
+
+        Runs once per process for each URL, database and collection unless
+        force is set. Set MONGO_ENSURE_INDEXES to False to skip it on connect.
+        """
+        key = self._claim_indexes(force)
+        if key is None:
+            return
+        try:
+            names = self.collection.create_indexes(self._index_models())
+            logger.debug(f"{self.collection_name}: indexes ensured {names}")
+        except PyMongoError:
+            self._unclaim_indexes(key)
+            raise
+
+    def _check_plan(self, query=None, pipeline=None, sort=None):
+        """
+        Dev/test guard against collection scans.
+
+        With MONGO_EXPLAIN set to "warn" or "raise", explains the find query or
+        aggregation pipeline and reports a COLLSCAN when the collection holds
+        at least MONGO_EXPLAIN_MIN_DOCS documents. Disabled by default.
+        """
+        mode = base_config.get("MONGO_EXPLAIN")
+        if not mode:
+            return
+        if self.collection.estimated_document_count() < base_config.get("MONGO_EXPLAIN_MIN_DOCS", 1000):
+            return
+        if pipeline is not None:
+            plan = self.collection.database.command(
+                "explain",
+                {"aggregate": self.collection_name, "pipeline": pipeline, "cursor": {}},
+                verbosity="queryPlanner",
+            )
+        else:
+            plan = self.collection.find(query, sort=sort).limit(1).explain()
+        self._report_plan(plan, mode, pipeline if pipeline is not None else query)
+
+    def is_connected(self) -> bool:
+        """Check if the connection to MongoDB is established and credentials are valid."""
+        if self.client is None:
+            return False
+        try:
+            self.client.admin.command("ping")
+            return True
+        except Exception:
+            return False
+
+    def close(self) -> None:
+        """Release the shared client; it is closed once no DAO uses it."""
+        if self.client:
+            idle = self.registry.release(self.client)
+            if idle is not None:
+                idle.close()
+            self.client = None
+            self.collection = None
+
+    def __enter__(self):
+        """Context manager entry."""
+        self.connect()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        """Context manager exit."""
+        self.close()
+
+    def _total(self, pagination, match):
+        return resolve_total(
+            pagination,
+            self._count_namespace,
+            lambda: self.collection.count_documents(match or {}),
+            # the collection metadata count only holds for the whole collection
+            estimated=None if match else self.collection.estimated_document_count,
+            where=match,
+        )
+
+    def get_all(self, pagination=None, filters=None, sort_key="_id", projection=None):
+        """
+        Lists documents, optionally filtered and paginated.
+
+        Args:
+            pagination (dict): {"page", "per_page"} for offset pagination or
+                {"after", "per_page"} for keyset pagination (see get_pagination)
+            filters (list): $match conditions merged together
+            sort_key (str): keyset sort field, "-field" for descending; _id is
+                always the tie-breaker
+            projection: fields to return, see _projection
+
+        Returns:
+            dict: {"metadata": ..., "data": [...]}
+        """
+        if is_keyset(pagination):
+            return self._get_keyset(pagination, filters, sort_key, projection)
+
+        query, match = self._all_pipeline(pagination, filters, projection)
+        if filters:
+            self._check_plan(pipeline=query)
         rs = list(self.collection.aggregate(query))[0]
-        return self._fetch_all(rs, pagination=pagination)
+        total = None
+        if pagination and count_mode(pagination) not in ("exact", "none"):
+            total = self._total(pagination, match)
+        return self._fetch_all(rs, pagination=pagination, total=total)
+
+    def _get_keyset(self, pagination, filters, sort_key, projection=None):
+        # find() + sort + limit instead of $facet so the sort can use an index
+        match, query, sort, column = self._keyset_query(pagination, filters, sort_key)
+        if query or column != "_id":
+            self._check_plan(query=query, sort=sort)
+        project = self._projection(projection, required=(column,))
+        rows = list(self.collection.find(query, project, sort=sort, limit=pagination["per_page"] + 1))
+        return self._keyset_result(rows, pagination, column, self._total(pagination, match))
 
     def get_descr_by_id(self, _id):
-        rs = self.collection.find_one({"_id": ObjectId(_id)})
+        rs = self.collection.find_one({"_id": ObjectId(_id)}, {"name": 1})
         if rs and "_id" in rs and "name" in rs:
             return {"_id": str(rs["_id"]), "name": rs["name"]}
         return None
 
-    def get_by_id(self, _id):
+    def get_by_id(self, _id, projection=None):
         if isinstance(_id, ObjectId):
-            rs = self.collection.find_one({"_id": _id})
+            rs = self.collection.find_one({"_id": _id}, self._projection(projection))
         else:
-            rs = self.collection.find_one({"_id": ObjectId(_id)})
+            rs = self.collection.find_one({"_id": ObjectId(_id)}, self._projection(projection))
         self._to_dict(rs)
         return rs
 
-    def get_by_name(self, name):
-        rs = self.collection.find_one({"name": name})
+    def get_by_ids(self, ids, projection=None):
+        """
+        Fetches several documents with one $in query.
+
+        Args:
+            ids (Iterable): document ids (str or ObjectId)
+            projection: fields to return, see _projection
+
+        Returns:
+            list: documents in the order of ids, None where not found
+        """
+        ids = list(ids)
+        oids = [_id if isinstance(_id, ObjectId) else ObjectId(_id) for _id in ids]
+        found = {}
+        for rs in self.collection.find({"_id": {"$in": list(set(oids))}}, self._projection(projection)):
+            self._to_dict(rs)
+            found[rs["_id"]] = rs
+        return [found.get(str(oid)) for oid in oids]
+
+    def get_by_name(self, name, projection=None):
+        self._check_plan(query={"name": name})
+        rs = self.collection.find_one({"name": name}, self._projection(projection))
         self._to_dict(rs)
         return rs
 
     def update_by_query(self, query, vo):
         self._from_dict(vo)
         logger.debug(query)
+        self._check_plan(query=query)
         rs = self.collection.update_one(query, {"$set": vo})
         return rs.modified_count > 0
 
@@ -238,6 +680,7 @@ class MongoDAO:
             # vo["created_at"] = datetime.utcnow() #TODO: Object of type datetime is not JSON serializable
             self._from_dict(vo)
             pk = self.collection.insert_one(vo)
+            count_cache.invalidate(self._count_namespace)
             vo.update({"_id": str(pk.inserted_id)})
             return str(pk.inserted_id)
         except PyMongoError as e:
@@ -245,12 +688,128 @@ class MongoDAO:
             raise
 
     def persist_many(self, arr):
-        return self.collection.insert_many(arr)
+        rs = self.collection.insert_many(arr)
+        count_cache.invalidate(self._count_namespace)
+        return rs
+
+    def _bulk_flush(self, requests, results):
+        errors = {}
+        upserted = {}
+        try:
+            rs = self.collection.bulk_write([r for r, _, _ in requests], ordered=False)
+            upserted = rs.upserted_ids or {}
+        except BulkWriteError as e:
+            errors = {err["index"]: err.get("errmsg") for err in e.details.get("writeErrors", [])}
+            upserted = {u["index"]: u["_id"] for u in e.details.get("upserted", [])}
+        self._bulk_results(requests, results, errors, upserted)
+
+    def bulk(self, operations, batch_size: int = 1000) -> List[Dict[str, Any]]:
+        """
+        Applies mixed write operations through unordered bulk_write batches.
+
+        Operations are dicts with an "op" key:
+            {"op": "insert", "doc": {...}}
+            {"op": "update", "_id": id, "doc": {...}}          ($set)
+            {"op": "upsert", "_id": id, "doc": {...}}          ($set, upsert)
+            {"op": "upsert", "filter": {...}, "doc": {...}}
+            {"op": "delete", "_id": id}
+        _id values are converted with ObjectId like _from_dict; inserts get
+        their _id generated client-side so it can be reported.
+
+        Args:
+            operations (Iterable[dict]): operations, consumed lazily
+            batch_size (int): operations per bulk_write round-trip
+
+        Returns:
+            List[dict]: one result per operation, in input order, with
+            index, op, ok, _id and error (matched/modified counts are only
+            reported by MongoDB per batch, not per operation)
+        """
+        results = []
+        requests = []
+        for operation in operations:
+            request, _id = self._bulk_request(operation)
+            requests.append((request, _id, operation["op"]))
+            if len(requests) >= batch_size:
+                self._bulk_flush(requests, results)
+                requests = []
+        if requests:
+            self._bulk_flush(requests, results)
+        count_cache.invalidate(self._count_namespace)
+        return results
+
+    def export_stream(self, target, fmt="ndjson", compress=None, batch_size=1000, filters=None, projection=None):
+        """
+        Exports the collection to an NDJSON or BSON stream with constant memory.
+
+        Documents are read from a cursor in batches of batch_size and written
+        one by one. NDJSON uses canonical extended JSON, so ObjectId, dates
+        and the int32/int64/double types survive the round trip; BSON writes
+        the raw documents untouched.
+
+        Args:
+            target: file path (".gz" implies gzip) or writable binary file
+            fmt (str): "ndjson" or "bson"
+            compress (Optional[bool]): force gzip on/off, None infers from the path
+            batch_size (int): cursor batch size
+            filters (list): $match conditions merged together
+            projection: fields to export, see _projection
+
+        Returns:
+            int: number of exported documents
+        """
+        collection = self._export_collection(fmt)
+        total = 0
+        with _open_stream(target, "wb", compress) as f:
+            cursor = collection.find(self._match(filters), self._projection(projection), batch_size=batch_size)
+            for doc in cursor:
+                f.write(_export_record(doc, fmt))
+                total += 1
+        return total
+
+    def import_stream(self, source, fmt="ndjson", compress=None, batch_size=1000):
+        """
+        Imports an NDJSON or BSON stream written by export_stream.
+
+        Documents are inserted with unordered insert_many batches; duplicate
+        keys and other write errors are counted, not raised.
+
+        Args:
+            source: file path (".gz" implies gzip) or readable binary file
+            fmt (str): "ndjson" or "bson"
+            compress (Optional[bool]): force gzip on/off, None infers from the path
+            batch_size (int): documents per insert_many
+
+        Returns:
+            dict: {"inserted": int, "errors": int}
+        """
+        result = {"inserted": 0, "errors": 0}
+
+        def flush(batch):
+            try:
+                rs = self.collection.insert_many(batch, ordered=False)
+                result["inserted"] += len(rs.inserted_ids)
+            except BulkWriteError as e:
+                _count_import_errors(result, e)
+
+        with _open_stream(source, "rb", compress) as f:
+            batch = []
+            for doc in _import_records(f, fmt):
+                batch.append(doc)
+                if len(batch) >= batch_size:
+                    flush(batch)
+                    batch = []
+            if batch:
+                flush(batch)
+        count_cache.invalidate(self._count_namespace)
+        return result
 
     def delete_by_id(self, _id):
         dr = self.collection.delete_one({"_id": ObjectId(_id)})
+        count_cache.invalidate(self._count_namespace)
         return dr.deleted_count > 0
 
     def delete_all(self):
         dr = self.collection.delete_many({})
+        count_cache.invalidate(self._count_namespace)
         return dr.deleted_count > 0
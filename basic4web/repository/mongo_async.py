@@ -0,0 +1,343 @@
+import asyncio
+import os
+import threading
+import weakref
+from typing import Any, Dict, List, Union
+
+from bson import ObjectId
+from pymongo import AsyncMongoClient
+from pymongo.errors import BulkWriteError, PyMongoError
+
+import basic4web.config as base_config
+from basic4web.middleware.logging import logger
+from basic4web.repository.mongo import (
+    ClientRegistry,
+    MongoDAOMixin,
+    _count_import_errors,
+    _export_record,
+    _import_records,
+    _open_stream,
+)
+from basic4web.repository.pagination import count_cache, count_mode, is_keyset
+
+
+class AsyncClientRegistry:
+    """
+    ClientRegistry per event loop.
+
+    An AsyncMongoClient is bound to the loop it is used on, so clients are
+    shared by the DAOs of one loop only. Registries of loops that were
+    garbage collected are dropped; ``await close_all()`` before a loop ends
+    closes its clients.
+    """
+
+    def __init__(self, factory):
+        self._factory = factory
+        self._reset()
+
+    def _current(self):
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            registry = self._registries.get(loop)
+            if registry is None:
+                registry = self._registries[loop] = ClientRegistry(self._factory)
+            return registry
+
+    def acquire(self, url, **options):
+        return self._current().acquire(url, **options)
+
+    def release(self, client):
+        return self._current().release(client)
+
+    async def close_all(self):
+        """Close the clients of the running loop."""
+        for client in self._current()._drain():
+            await client.close()
+
+    def stats(self):
+        with self._lock:
+            registries = list(self._registries.values())
+        return [entry for registry in registries for entry in registry.stats()]
+
+    def _reset(self):
+        self._registries = weakref.WeakKeyDictionary()
+        self._lock = threading.Lock()
+
+
+async_client_registry = AsyncClientRegistry(AsyncMongoClient)
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=async_client_registry._reset)
+
+
+class AsyncMongoDAO(MongoDAOMixin):
+    """
+    asyncio counterpart of MongoDAO built on pymongo's AsyncMongoClient.
+
+    Exposes the MongoDAO API with coroutines instead of blocking calls;
+    pipelines, projections, pagination metadata and the _to_dict/_from_dict
+    conversions come from MongoDAOMixin. Clients come from a registry keyed
+    by event loop, URL and options.
+
+    The client is acquired by ``await dao.connect()`` (or ``async with dao``),
+    which also ensures the declared INDEXES.
+
+    Example:
+        async with AsyncMongoDAO(url, "users", UserSchema) as dao:
+            page = await dao.get_all({"page": 1, "per_page": 20})
+    """
+
+    registry = async_client_registry
+
+    def _connect_on_init(self):
+        # clients belong to a loop: acquired by connect() on the running one
+        pass
+
+    async def connect(self) -> None:
+        """Acquires the shared client of the running loop and ensures the declared INDEXES."""
+        if not self.client:
+            self._acquire()
+            if self.INDEXES and base_config.get("MONGO_ENSURE_INDEXES", True):
+                await self.ensure_indexes()
+
+    async def ensure_indexes(self, force: bool = False) -> None:
+        """Async counterpart of MongoDAO.ensure_indexes."""
+        key = self._claim_indexes(force)
+        if key is None:
+            return
+        try:
+            names = await self.collection.create_indexes(self._index_models())
+            logger.debug(f"{self.collection_name}: indexes ensured {names}")
+        except PyMongoError:
+            self._unclaim_indexes(key)
+            raise
+
+    async def _check_plan(self, query=None, pipeline=None, sort=None):
+        mode = base_config.get("MONGO_EXPLAIN")
+        if not mode:
+            return
+        if await self.collection.estimated_document_count() < base_config.get("MONGO_EXPLAIN_MIN_DOCS", 1000):
+            return
+        if pipeline is not None:
+            plan = await self.collection.database.command(
+                "explain",
+                {"aggregate": self.collection_name, "pipeline": pipeline, "cursor": {}},
+                verbosity="queryPlanner",
+            )
+        else:
+            plan = await self.collection.find(query, sort=sort).limit(1).explain()
+        self._report_plan(plan, mode, pipeline if pipeline is not None else query)
+
+    async def is_connected(self) -> bool:
+        if self.client is None:
+            return False
+        try:
+            await self.client.admin.command("ping")
+            return True
+        except Exception:
+            return False
+
+    async def close(self) -> None:
+        """Release the shared client; it is closed once no DAO uses it."""
+        if self.client:
+            idle = self.registry.release(self.client)
+            if idle is not None:
+                await idle.close()
+            self.client = None
+            self.collection = None
+
+    async def __aenter__(self):
+        await self.connect()
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.close()
+
+    async def _total(self, pagination, match):
+        mode = count_mode(pagination)
+        if mode == "none":
+            return None
+        if mode == "exact":
+            return await self.collection.count_documents(match or {})
+        if mode == "estimated" and not match:
+            # the collection metadata count only holds for the whole collection
+            return await self.collection.estimated_document_count()
+        total = count_cache.get(self._count_namespace, match)
+        if total is None:
+            total = await self.collection.count_documents(match or {})
+            count_cache.put(self._count_namespace, match, total)
+        return total
+
+    async def get_all(self, pagination=None, filters=None, sort_key="_id", projection=None):
+        """Async counterpart of MongoDAO.get_all."""
+        if is_keyset(pagination):
+            return await self._get_keyset(pagination, filters, sort_key, projection)
+
+        query, match = self._all_pipeline(pagination, filters, projection)
+        if filters:
+            await self._check_plan(pipeline=query)
+        cursor = await self.collection.aggregate(query)
+        rs = (await cursor.to_list())[0]
+        total = None
+        if pagination and count_mode(pagination) not in ("exact", "none"):
+            total = await self._total(pagination, match)
+        return self._fetch_all(rs, pagination=pagination, total=total)
+
+    async def _get_keyset(self, pagination, filters, sort_key, projection=None):
+        match, query, sort, column = self._keyset_query(pagination, filters, sort_key)
+        if query or column != "_id":
+            await self._check_plan(query=query, sort=sort)
+        project = self._projection(projection, required=(column,))
+        cursor = self.collection.find(query, project, sort=sort, limit=pagination["per_page"] + 1)
+        rows = await cursor.to_list()
+        return self._keyset_result(rows, pagination, column, await self._total(pagination, match))
+
+    async def get_descr_by_id(self, _id):
+        rs = await self.collection.find_one({"_id": ObjectId(_id)}, {"name": 1})
+        if rs and "_id" in rs and "name" in rs:
+            return {"_id": str(rs["_id"]), "name": rs["name"]}
+        return None
+
+    async def get_by_id(self, _id, projection=None):
+        if not isinstance(_id, ObjectId):
+            _id = ObjectId(_id)
+        rs = await self.collection.find_one({"_id": _id}, self._projection(projection))
+        self._to_dict(rs)
+        return rs
+
+    async def get_by_ids(self, ids, projection=None):
+        """Async counterpart of MongoDAO.get_by_ids."""
+        ids = list(ids)
+        oids = [_id if isinstance(_id, ObjectId) else ObjectId(_id) for _id in ids]
+        found = {}
+        async for rs in self.collection.find({"_id": {"$in": list(set(oids))}}, self._projection(projection)):
+            self._to_dict(rs)
+            found[rs["_id"]] = rs
+        return [found.get(str(oid)) for oid in oids]
+
+    async def get_by_name(self, name, projection=None):
+        await self._check_plan(query={"name": name})
+        rs = await self.collection.find_one({"name": name}, self._projection(projection))
+        self._to_dict(rs)
+        return rs
+
+    async def update_by_query(self, query, vo):
+        self._from_dict(vo)
+        logger.debug(query)
+        await self._check_plan(query=query)
+        rs = await self.collection.update_one(query, {"$set": vo})
+        return rs.modified_count > 0
+
+    async def update_by_id(self, _id: Union[str, ObjectId], vo: Dict[str, Any]) -> bool:
+        """Async counterpart of MongoDAO.update_by_id."""
+        try:
+            self._from_dict(vo)
+            query = {"$set": vo}
+            logger.debug(query)
+            if not isinstance(_id, ObjectId):
+                _id = ObjectId(_id)
+            rs = await self.collection.update_one({"_id": _id}, query)
+            self._to_dict(vo)
+            return rs.modified_count > 0
+        except PyMongoError as e:
+            logger.error(f"Error updating document: {str(e)}")
+            raise
+
+    async def persist(self, vo: Dict[str, Any]) -> str:
+        """Async counterpart of MongoDAO.persist."""
+        try:
+            if "_id" in vo:
+                vo.pop("_id")
+            self._from_dict(vo)
+            pk = await self.collection.insert_one(vo)
+            count_cache.invalidate(self._count_namespace)
+            vo.update({"_id": str(pk.inserted_id)})
+            return str(pk.inserted_id)
+        except PyMongoError as e:
+            logger.error(f"Error persisting document: {str(e)}")
+            raise
+
+    async def persist_many(self, arr):
+        rs = await self.collection.insert_many(arr)
+        count_cache.invalidate(self._count_namespace)
+        return rs
+
+    async def _bulk_flush(self, requests, results):
+        errors = {}
+        upserted = {}
+        try:
+            rs = await self.collection.bulk_write([r for r, _, _ in requests], ordered=False)
+            upserted = rs.upserted_ids or {}
+        except BulkWriteError as e:
+            errors = {err["index"]: err.get("errmsg") for err in e.details.get("writeErrors", [])}
+            upserted = {u["index"]: u["_id"] for u in e.details.get("upserted", [])}
+        self._bulk_results(requests, results, errors, upserted)
+
+    async def bulk(self, operations, batch_size: int = 1000) -> List[Dict[str, Any]]:
+        """Async counterpart of MongoDAO.bulk."""
+        results = []
+        requests = []
+        for operation in operations:
+            request, _id = self._bulk_request(operation)
+            requests.append((request, _id, operation["op"]))
+            if len(requests) >= batch_size:
+                await self._bulk_flush(requests, results)
+                requests = []
+        if requests:
+            await self._bulk_flush(requests, results)
+        count_cache.invalidate(self._count_namespace)
+        return results
+
+    async def export_stream(self, target, fmt="ndjson", compress=None, batch_size=1000, filters=None,
+                            projection=None):
+        """
+        Async counterpart of MongoDAO.export_stream.
+
+        Documents are fetched with the async cursor; writes to target are
+        blocking, so prefer a local file or an in-memory buffer.
+        """
+        collection = self._export_collection(fmt)
+        total = 0
+        with _open_stream(target, "wb", compress) as f:
+            cursor = collection.find(self._match(filters), self._projection(projection), batch_size=batch_size)
+            async for doc in cursor:
+                f.write(_export_record(doc, fmt))
+                total += 1
+        return total
+
+    async def import_stream(self, source, fmt="ndjson", compress=None, batch_size=1000):
+        """
+        Async counterpart of MongoDAO.import_stream.
+
+        Reads from source are blocking; each batch is inserted with an
+        awaited unordered insert_many.
+        """
+        result = {"inserted": 0, "errors": 0}
+
+        async def flush(batch):
+            try:
+                rs = await self.collection.insert_many(batch, ordered=False)
+                result["inserted"] += len(rs.inserted_ids)
+            except BulkWriteError as e:
+                _count_import_errors(result, e)
+
+        with _open_stream(source, "rb", compress) as f:
+            batch = []
+            for doc in _import_records(f, fmt):
+                batch.append(doc)
+                if len(batch) >= batch_size:
+                    await flush(batch)
+                    batch = []
+            if batch:
+                await flush(batch)
+        count_cache.invalidate(self._count_namespace)
+        return result
+
+    async def delete_by_id(self, _id):
+        dr = await self.collection.delete_one({"_id": ObjectId(_id)})
+        count_cache.invalidate(self._count_namespace)
+        return dr.deleted_count > 0
+
+    async def delete_all(self):
+        dr = await self.collection.delete_many({})
+        count_cache.invalidate(self._count_namespace)
+        return dr.deleted_count > 0
@@ -1,21 +1,64 @@
+import logging
+from contextlib import contextmanager
+from functools import partial
+
 import pymysql
 from marshmallow import Schema, fields
 
+import basic4web.config as base_config
 from basic4web.middleware.logging import logger
+from basic4web.repository.pagination import (
+    count_cache,
+    count_mode,
+    is_keyset,
+    keyset_metadata,
+    keyset_page,
+    keyset_sql,
+    parse_order_by,
+    resolve_total,
+    row_value,
+    trim_page,
+)
+from basic4web.repository.pool import get_pool
+from basic4web.repository.statements import statement
+
+
+def _ping(conn):
+    conn.ping(reconnect=False)
 
 
 class MySQLDAO:
 
     def __init__(
-            self, host, port, user, password, database, table_name, schema=None, conn=None
+            self, host, port, user, password, database, table_name, schema=None, conn=None, pool_options=None
     ):
+        """
+        Without conn, connections are borrowed from a process-wide pool shared
+        by every DAO on the same host, port, user and database, so one DAO can
+        serve concurrent threads. pool_options override the pool defaults
+        (MYSQL_POOL_MIN_SIZE, MYSQL_POOL_MAX_SIZE, MYSQL_POOL_MAX_LIFETIME,
+        MYSQL_POOL_PING_INTERVAL, MYSQL_POOL_TIMEOUT) for the DAO creating the
+        pool. A given conn is used as is, as before.
+        """
         self.table_name = table_name
+        self._count_namespace = f"mysql:{host}:{port}/{database}.{table_name}"
         self.schema = schema() if schema else None
         self.pageSchema = None
-        self.conn = (
-            conn
-            if conn
-            else pymysql.connect(
+        self.conn = conn
+        self.pool = None
+        self._tx_depth = 0
+        self._max_packet = None
+        if conn is None:
+            options = {
+                "min_size": base_config.get("MYSQL_POOL_MIN_SIZE", 1),
+                "max_size": base_config.get("MYSQL_POOL_MAX_SIZE", 10),
+                "max_lifetime": base_config.get("MYSQL_POOL_MAX_LIFETIME", 3600),
+                "ping_interval": base_config.get("MYSQL_POOL_PING_INTERVAL", 5),
+                "timeout": base_config.get("MYSQL_POOL_TIMEOUT", 30),
+            }
+            options.update(pool_options or {})
+            factory = partial(
+                pymysql.connect,
                 host=host,
                 user=user,
                 password=password,
@@ -25,7 +68,7 @@ class MySQLDAO:
                 connect_timeout=300,
                 autocommit=True,
             )
-        )
+            self.pool = get_pool(("mysql", host, port, user, database), factory, ping=_ping, **options)
 
         if schema:
             page_class = type(
@@ -59,9 +102,62 @@ class MySQLDAO:
         except Exception:
             return f"{sql} | PARAMS: {params}"
 
-    def _query(self, sql, params=None, fetch=False):
-        cursor = self.conn.cursor(pymysql.cursors.DictCursor)
-        logger.debug(self._interpolate_sql(sql, params))
+    def _log_sql(self, sql, params):
+        # interpolating parameters is costly: only do it when debug is on
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(self._interpolate_sql(sql, params), stacklevel=2)
+
+    @contextmanager
+    def _connection(self):
+        if self.pool is None:
+            yield self.conn
+        else:
+            with self.pool.connection() as conn:
+                yield conn
+
+    def _commit(self, conn):
+        # pooled connections autocommit; transaction() commits at its end
+        if self.pool is None and not self._tx_depth:
+            conn.commit()
+
+    @contextmanager
+    def transaction(self):
+        """
+        Runs several statements in one transaction.
+
+        DAO calls made by this thread inside the block (on any DAO sharing the
+        pool) use the same connection; the block commits on exit and rolls
+        back if it raises. Nested blocks join the outer one.
+
+        Example:
+            with dao.transaction():
+                dao.persist(order)
+                items_dao.persist_many(items)
+        """
+        if self.pool is not None:
+            with self.pool.transaction() as conn:
+                yield conn
+            return
+        if self._tx_depth:
+            yield self.conn
+            return
+        self._tx_depth = 1
+        try:
+            self.conn.begin()
+            yield self.conn
+            self.conn.commit()
+        except BaseException:
+            self.conn.rollback()
+            raise
+        finally:
+            self._tx_depth = 0
+
+    def _query(self, sql, params=None, fetch=False, conn=None):
+        if conn is None:
+            with self._connection() as conn:
+                return self._query(sql, params, fetch, conn)
+        self._log_sql(sql, params)
+        cursor = conn.cursor(pymysql.cursors.DictCursor)
         try:
             cursor.execute(sql, params)
             if fetch:
@@ -70,35 +166,123 @@ class MySQLDAO:
             cursor.close()
 
     def __del__(self):
-        self.conn.close()
+        # pooled connections belong to the pool, not to the DAO
+        if getattr(self, "pool", None) is None and getattr(self, "conn", None) is not None:
+            self.conn.close()
 
     def get_all(self, pagination=None, order_by=None):
+        if is_keyset(pagination):
+            return self._get_keyset(pagination, order_by)
+
         sql = f"SELECT * FROM {self.table_name}"
         if order_by:
             sql += f" order by {order_by}"
-        count_sql = f"SELECT COUNT(*) AS total FROM {self.table_name}"
         rows = []
-        total = self._query(count_sql, fetch=True)[0]["total"]
 
         if pagination:
             page = pagination.get("page", 1)
             per_page = pagination.get("per_page", 10)
             offset = (page - 1) * per_page
-            sql += f" LIMIT {per_page} OFFSET {offset}"
-            pagination["total_elements"] = total
-        else:
-            pagination = {"total_elements": total, "page": 1, "per_page": total}
+            mode = count_mode(pagination)
+            limit = per_page + 1 if mode == "none" else per_page
+            sql += f" LIMIT {limit} OFFSET {offset}"
 
         rs = self._query(sql, fetch=True)
         if rs:
             rows = [row for row in rs]
             for r in rows:
                 self.to_dict(r)
+
+        if pagination:
+            if mode == "none":
+                rows, pagination["has_next"] = trim_page(rows, per_page)
+            else:
+                pagination["total_elements"] = self._total(pagination)
+        else:
+            total = len(rows)
+            pagination = {"total_elements": total, "page": 1, "per_page": total}
         return {
             "metadata": pagination,
             "data": rows,
         }
 
+    def iter_all(self, where=None, params=None, order_by=None, batch_size=1000):
+        """
+        Yield rows lazily from an unbuffered server-side cursor (SSDictCursor).
+
+        Rows are read from the socket batch_size at a time, so memory stays
+        flat whatever the table size; pass the generator to
+        base_controller.response_stream to export a table. The connection is
+        busy until the generator is exhausted or closed: do not run other
+        queries on it meanwhile (e.g. inside the same transaction()).
+
+        Args:
+            where (str): optional WHERE clause with %s placeholders
+            params (tuple): parameters of the WHERE clause
+            order_by (str): optional ORDER BY clause
+            batch_size (int): rows per fetchmany call
+        """
+        sql = f"SELECT * FROM {self.table_name}"
+        if where:
+            sql += f" WHERE {where}"
+        if order_by:
+            sql += f" ORDER BY {order_by}"
+        self._log_sql(sql, params)
+        conn = self.conn if self.pool is None else self.pool.acquire()
+        cursor = None
+        done = False
+        try:
+            cursor = conn.cursor(pymysql.cursors.SSDictCursor)
+            cursor.execute(sql, params)
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                for row in rows:
+                    yield self.to_dict(row)
+            done = True
+        finally:
+            if self.pool is not None and not done and not self.pool.in_transaction():
+                # closing the cursor would drain the unread rows: drop the connection instead
+                self.pool.release(conn, discard=True)
+            else:
+                if cursor is not None:
+                    cursor.close()
+                if self.pool is not None:
+                    self.pool.release(conn)
+
+    def _total(self, pagination):
+        return resolve_total(pagination, self._count_namespace, self.count_all, estimated=self._estimated_count)
+
+    def _estimated_count(self):
+        # InnoDB statistics estimate from information_schema
+        sql = (
+            "SELECT TABLE_ROWS AS total FROM information_schema.TABLES "
+            "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s"
+        )
+        rs = self._query(sql, (self.table_name,), fetch=True)
+        return rs[0]["total"] if rs and rs[0]["total"] is not None else None
+
+    def _get_keyset(self, pagination, order_by=None):
+        column, descending = parse_order_by(order_by, "id")
+        per_page = pagination.get("per_page", 10)
+        where_sql, params, order_sql = keyset_sql(
+            column, "id", descending, pagination.get("after"), lambda i: "%s"
+        )
+        sql = f"SELECT * FROM {self.table_name}"
+        if where_sql:
+            sql += f" WHERE {where_sql}"
+        sql += f" ORDER BY {order_sql} LIMIT {per_page + 1}"
+        rows, next_token = keyset_page(self._query(sql, params, fetch=True) or [], per_page, column, "id")
+        metadata = keyset_metadata(pagination, next_token)
+        total = self._total(pagination)
+        if total is not None:
+            metadata["total_elements"] = total
+        return {
+            "metadata": metadata,
+            "data": [self.to_dict(r) for r in rows],
+        }
+
     def get_desc_by_id(self, id):
         sql = f"SELECT id,name FROM {self.table_name} WHERE id = %s"
         rs = self._query(sql, (id,), fetch=True)
@@ -107,12 +291,29 @@ class MySQLDAO:
         return row
 
     def get_by_id(self, id):
-        sql = f"SELECT * FROM {self.table_name} WHERE id = %s"
+        sql = statement("format", self.table_name, "select_by", key="id")
         rs = self._query(sql, (id,), fetch=True)
         row = rs[0] if rs else None
         self.to_dict(row)
         return row
 
+    def get_by_ids(self, ids, chunk_size=1000):
+        """
+        Fetch several rows with chunked IN (...) queries.
+
+        Returns:
+            list: rows in the order of ids, None where not found
+        """
+        ids = list(ids)
+        unique = list(dict.fromkeys(ids))
+        found = {}
+        for start in range(0, len(unique), chunk_size):
+            chunk = unique[start:start + chunk_size]
+            sql = statement("format", self.table_name, "select_in", n=len(chunk))
+            for row in self._query(sql, tuple(chunk), fetch=True) or []:
+                found[str(row_value(row, "id"))] = self.to_dict(row)
+        return [found.get(str(i)) for i in ids]
+
     def get_by_name(self, name):
         sql = f"SELECT * FROM {self.table_name} WHERE name = %s LIMIT 1"
         rs = self._query(sql, (name,), fetch=True)
@@ -122,48 +323,104 @@ class MySQLDAO:
 
     def update_by_id(self, id, vo):
         self.from_dict(vo)
-        keys = ", ".join([f"{k} = %s" for k in vo.keys()])
-        sql = f"UPDATE {self.table_name} SET {keys} WHERE id = %s"
+        sql = statement("format", self.table_name, "update", tuple(vo))
         values = list(vo.values()) + [id]
-        self._query(sql, values)
-        self.conn.commit()
+        with self._connection() as conn:
+            self._query(sql, values, conn=conn)
+            self._commit(conn)
         return True
 
     def persist(self, vo):
         self.from_dict(vo)
-        keys = ", ".join(vo.keys())
-        values_placeholder = ", ".join(["%s"] * len(vo))
-        sql = f"INSERT INTO {self.table_name} ({keys}) VALUES ({values_placeholder})"
+        sql = statement("format", self.table_name, "insert", tuple(vo))
         values = list(vo.values())
 
-        cursor = self.conn.cursor()
-        try:
-            logger.debug(self._interpolate_sql(sql, values))
-            cursor.execute(sql, values)
-            self.conn.commit()
-            return cursor.lastrowid
-        finally:
-            cursor.close()
+        self._log_sql(sql, values)
+        with self._connection() as conn:
+            cursor = conn.cursor()
+            try:
+                cursor.execute(sql, values)
+                self._commit(conn)
+                count_cache.invalidate(self._count_namespace)
+                return cursor.lastrowid
+            finally:
+                cursor.close()
 
-    def persist_many(self, arr):
-        if not arr:
-            return False
-        keys = ", ".join(arr[0].keys())
-        values_placeholder = ", ".join(["%s"] * len(arr[0]))
-        sql = f"INSERT INTO {self.table_name} ({keys}) VALUES ({values_placeholder})"
-        for item in arr:
-            self._query(sql, tuple(item.values()))
-        self.conn.commit()
-        return True
+    def _max_stmt_length(self, conn):
+        # multi-row statements must fit in one packet; ask the server once
+        if self._max_packet is None:
+            rs = self._query("SELECT @@max_allowed_packet AS size", fetch=True, conn=conn)
+            self._max_packet = int(rs[0]["size"]) if rs else 1024 * 1024
+        return max(self._max_packet - 64 * 1024, 64 * 1024)
+
+    def persist_many(self, arr, chunk_size=1000, upsert=False, update_columns=None):
+        """
+        Insert rows with multi-row INSERT statements.
+
+        Rows are sent in chunks through executemany, which pymysql rewrites
+        into INSERT ... VALUES (...), (...) statements split to fit the
+        server max_allowed_packet. Every row must have the columns of the
+        first one.
+
+        Args:
+            arr (Iterable[dict]): rows, consumed lazily chunk by chunk
+            chunk_size (int): rows per executemany call
+            upsert (bool): add ON DUPLICATE KEY UPDATE
+            update_columns (list): columns updated on duplicate keys,
+                every column but id by default; rows with only an id
+                leave duplicates untouched
+
+        Returns:
+            int: affected rows as reported by MySQL (an upsert counts 1 per
+            inserted row and 2 per updated row)
+        """
+        rows = iter(arr)
+        first = next(rows, None)
+        if first is None:
+            return 0
+        first = self.from_dict(first)
+        keys = tuple(first.keys())
+        sql = statement("format", self.table_name, "insert", keys)
+        if upsert:
+            columns = update_columns or [k for k in keys if k != "id"]
+            # with nothing to update, duplicates are kept as they are
+            assignments = ", ".join(f"{k} = VALUES({k})" for k in columns) or "id = id"
+            sql += " ON DUPLICATE KEY UPDATE " + assignments
+
+        affected = 0
+        chunk = [tuple(first[k] for k in keys)]
+        with self._connection() as conn:
+            cursor = conn.cursor()
+            try:
+                cursor.max_stmt_length = self._max_stmt_length(conn)
+                for item in rows:
+                    item = self.from_dict(item)
+                    chunk.append(tuple(item[k] for k in keys))
+                    if len(chunk) >= chunk_size:
+                        affected += self._execute_many(cursor, sql, chunk)
+                        chunk = []
+                if chunk:
+                    affected += self._execute_many(cursor, sql, chunk)
+                self._commit(conn)
+            finally:
+                cursor.close()
+        count_cache.invalidate(self._count_namespace)
+        return affected
+
+    def _execute_many(self, cursor, sql, chunk):
+        logger.debug(f"{sql} | {len(chunk)} rows")
+        return cursor.executemany(sql, chunk) or 0
 
     def delete_by_id(self, id):
-        sql = f"DELETE FROM {self.table_name} WHERE id = %s"
+        sql = statement("format", self.table_name, "delete_by", key="id")
         self._query(sql, (id,))
+        count_cache.invalidate(self._count_namespace)
         return True
 
     def delete_all(self):
         sql = f"DELETE FROM {self.table_name}"
         self._query(sql)
+        count_cache.invalidate(self._count_namespace)
         return True
 
     def count_all(self, where_clause=None, params=None):
@@ -1,19 +1,90 @@
+import logging
+import threading
+from contextlib import contextmanager
+
 import cx_Oracle
 from marshmallow import Schema, fields
 
+import basic4web.config as base_config
 from basic4web.middleware.logging import logger
+from basic4web.repository.pagination import (
+    count_cache,
+    count_mode,
+    is_keyset,
+    keyset_metadata,
+    keyset_page,
+    keyset_sql,
+    parse_order_by,
+    resolve_total,
+    row_value,
+    trim_page,
+)
+from basic4web.repository.statements import statement
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def _session_pool(user, password, dsn, options):
+    # one SessionPool per user and DSN, shared by every DAO of the process
+    key = (user, dsn)
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None:
+            pool = _pools[key] = cx_Oracle.SessionPool(
+                user=user,
+                password=password,
+                dsn=dsn,
+                min=options["pool_min"],
+                max=options["pool_max"],
+                increment=options["pool_increment"],
+                threaded=True,
+                getmode=cx_Oracle.SPOOL_ATTRVAL_WAIT,
+                stmtcachesize=options["stmtcachesize"],
+            )
+            pool.ping_interval = options["pool_ping_interval"]
+            pool.max_lifetime_session = options["pool_max_lifetime"]
+        return pool
 
 
 class OracleDAO:
     def __init__(
             self, host, port, user, password, service, table_name, schema=None, config=None
     ):
+        """
+        Connections are borrowed from a cx_Oracle.SessionPool shared by every
+        DAO on the same user and DSN.
+
+        config (dict) overrides the defaults taken from the ORACLE_* keys of
+        basic4web.config:
+            pool_min, pool_max, pool_increment (ORACLE_POOL_MIN/MAX/INCREMENT)
+            pool_ping_interval, pool_max_lifetime (seconds)
+            arraysize, prefetchrows: fetch tuning of unpaginated reads
+            batch_size: rows per executemany in persist_many
+            stmtcachesize: statements cached per session (ORACLE_STMT_CACHE_SIZE)
+        """
         self.table_name = table_name
+        self._count_namespace = f"oracle:{host}:{port}/{service}.{table_name}"
         self.schema = schema() if schema else None
         self.pageSchema = None
-        if config:
-            dsn = cx_Oracle.makedsn(host, port, service_name=service)
-            self.conn = cx_Oracle.connect(user, password, dsn)
+        options = {
+            "pool_min": base_config.get("ORACLE_POOL_MIN", 1),
+            "pool_max": base_config.get("ORACLE_POOL_MAX", 10),
+            "pool_increment": base_config.get("ORACLE_POOL_INCREMENT", 1),
+            "pool_ping_interval": base_config.get("ORACLE_POOL_PING_INTERVAL", 60),
+            "pool_max_lifetime": base_config.get("ORACLE_POOL_MAX_LIFETIME", 3600),
+            "arraysize": base_config.get("ORACLE_ARRAYSIZE", 500),
+            "prefetchrows": base_config.get("ORACLE_PREFETCHROWS", 2),
+            "batch_size": base_config.get("ORACLE_BATCH_SIZE", 1000),
+            "stmtcachesize": base_config.get("ORACLE_STMT_CACHE_SIZE", 50),
+        }
+        if isinstance(config, dict):
+            options.update(config)
+        self.arraysize = options["arraysize"]
+        self.prefetchrows = options["prefetchrows"]
+        self.batch_size = options["batch_size"]
+        dsn = cx_Oracle.makedsn(host, port, service_name=service)
+        self.pool = _session_pool(user, password, dsn, options)
 
         if schema:
             page_class = type(
@@ -47,50 +118,152 @@ class OracleDAO:
         except Exception:
             return f"{sql} | PARAMS: {params}"
 
-    def _query(self, sql, params=None, fetch=False):
-        cursor = self.conn.cursor()
-        logger.debug(self._interpolate_sql(sql, params))
+    def _log_sql(self, sql, params):
+        # interpolating parameters is costly: only do it when debug is on
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(self._interpolate_sql(sql, params), stacklevel=2)
+
+    @contextmanager
+    def _connection(self):
+        conn = self.pool.acquire()
         try:
-            cursor.execute(sql, params or ())
-            if fetch:
-                columns = [col[0] for col in cursor.description]
-                return [dict(zip(columns, row)) for row in cursor.fetchall()]
+            yield conn
         finally:
-            cursor.close()
+            self.pool.release(conn)
 
-    def __del__(self):
-        if hasattr(self, "conn"):
-            self.conn.close()
+    def _query(self, sql, params=None, fetch=False, commit=False, arraysize=None, prefetchrows=None):
+        """
+        Run a statement on a pooled connection.
+
+        arraysize and prefetchrows size the fetch round-trips of multi-row
+        reads; page reads fetch the whole page with the execute round-trip.
+        """
+        self._log_sql(sql, params)
+        with self._connection() as conn:
+            cursor = conn.cursor()
+            try:
+                if arraysize:
+                    cursor.arraysize = arraysize
+                    cursor.prefetchrows = prefetchrows or arraysize + 1
+                cursor.execute(sql, params or ())
+                if fetch:
+                    columns = [col[0] for col in cursor.description]
+                    return [dict(zip(columns, row)) for row in cursor.fetchall()]
+                if commit:
+                    conn.commit()
+            finally:
+                cursor.close()
 
     def get_all(self, pagination=None, order_by=None):
+        if is_keyset(pagination):
+            return self._get_keyset(pagination, order_by)
+
         sql = f"SELECT * FROM {self.table_name}"
         if order_by:
             sql += f" ORDER BY {order_by}"
-        count_sql = f"SELECT COUNT(*) AS total FROM {self.table_name}"
-
-        count_result = self._query(count_sql, fetch=True)
-        total = count_result[0]["TOTAL"] if count_result else 0
         rows = []
 
         if pagination:
             page = pagination.get("page", 1)
             per_page = pagination.get("per_page", 10)
             offset = (page - 1) * per_page
-            sql += f" OFFSET {offset} ROWS FETCH NEXT {per_page} ROWS ONLY"
-            pagination["total_elements"] = total
-        else:
-            pagination = {"total_elements": total, "page": 1, "per_page": total}
+            mode = count_mode(pagination)
+            limit = per_page + 1 if mode == "none" else per_page
+            sql += f" OFFSET {offset} ROWS FETCH NEXT {limit} ROWS ONLY"
 
-        rs = self._query(sql, fetch=True)
+        if pagination:
+            rs = self._query(sql, fetch=True, arraysize=limit)
+        else:
+            rs = self._query(sql, fetch=True, arraysize=self.arraysize, prefetchrows=self.prefetchrows)
         if rs:
             rows = [row for row in rs]
             for r in rows:
                 self.to_dict(r)
+
+        if pagination:
+            if mode == "none":
+                rows, pagination["has_next"] = trim_page(rows, per_page)
+            else:
+                pagination["total_elements"] = self._total(pagination)
+        else:
+            total = len(rows)
+            pagination = {"total_elements": total, "page": 1, "per_page": total}
         return {
             "metadata": pagination,
             "data": rows,
         }
 
+    def iter_all(self, where=None, params=None, order_by=None, batch_size=None):
+        """
+        Yield rows lazily, fetching batch_size rows per round-trip.
+
+        Unlike get_all, memory stays flat whatever the table size; pass the
+        generator to base_controller.response_stream to export a table. A
+        pooled session is held until the generator is exhausted or closed.
+
+        Args:
+            where (str): optional WHERE clause with :n placeholders
+            params (tuple): parameters of the WHERE clause
+            order_by (str): optional ORDER BY clause
+            batch_size (int): rows per fetch, self.arraysize by default
+        """
+        batch_size = batch_size or self.arraysize
+        sql = f"SELECT * FROM {self.table_name}"
+        if where:
+            sql += f" WHERE {where}"
+        if order_by:
+            sql += f" ORDER BY {order_by}"
+        self._log_sql(sql, params)
+        with self._connection() as conn:
+            cursor = conn.cursor()
+            try:
+                cursor.arraysize = batch_size
+                cursor.prefetchrows = batch_size + 1
+                cursor.execute(sql, params or ())
+                columns = [col[0] for col in cursor.description]
+                while True:
+                    rows = cursor.fetchmany(batch_size)
+                    if not rows:
+                        break
+                    for row in rows:
+                        yield self.to_dict(dict(zip(columns, row)))
+            finally:
+                cursor.close()
+
+    def _total(self, pagination):
+        return resolve_total(pagination, self._count_namespace, self._count_exact, estimated=self._estimated_count)
+
+    def _count_exact(self):
+        count_result = self._query(f"SELECT COUNT(*) AS total FROM {self.table_name}", fetch=True)
+        return count_result[0]["TOTAL"] if count_result else 0
+
+    def _estimated_count(self):
+        # NUM_ROWS from the optimizer statistics, None when never gathered
+        sql = "SELECT NUM_ROWS AS total FROM USER_TABLES WHERE TABLE_NAME = :1"
+        rs = self._query(sql, (self.table_name.upper(),), fetch=True)
+        return rs[0]["TOTAL"] if rs and rs[0]["TOTAL"] is not None else None
+
+    def _get_keyset(self, pagination, order_by=None):
+        column, descending = parse_order_by(order_by, "id")
+        per_page = pagination.get("per_page", 10)
+        where_sql, params, order_sql = keyset_sql(
+            column, "id", descending, pagination.get("after"), lambda i: f":{i}"
+        )
+        sql = f"SELECT * FROM {self.table_name}"
+        if where_sql:
+            sql += f" WHERE {where_sql}"
+        sql += f" ORDER BY {order_sql} FETCH NEXT {per_page + 1} ROWS ONLY"
+        rs = self._query(sql, params, fetch=True, arraysize=per_page + 1)
+        rows, next_token = keyset_page(rs or [], per_page, column, "id")
+        metadata = keyset_metadata(pagination, next_token)
+        total = self._total(pagination)
+        if total is not None:
+            metadata["total_elements"] = total
+        return {
+            "metadata": metadata,
+            "data": [self.to_dict(r) for r in rows],
+        }
+
     def get_desc_by_id(self, id):
         sql = f"SELECT id, name FROM {self.table_name} WHERE id = :1"
         rs = self._query(sql, (id,), fetch=True)
@@ -99,12 +272,30 @@ class OracleDAO:
         return row
 
     def get_by_id(self, id):
-        sql = f"SELECT * FROM {self.table_name} WHERE id = :1"
+        sql = statement("numeric", self.table_name, "select_by", key="id")
         rs = self._query(sql, (id,), fetch=True)
         row = rs[0] if rs else None
         self.to_dict(row)
         return row
 
+    def get_by_ids(self, ids, chunk_size=1000):
+        """
+        Fetch several rows with chunked IN (...) queries.
+        chunk_size stays within ORA-01795 (at most 1000 expressions in a list).
+
+        Returns:
+            list: rows in the order of ids, None where not found
+        """
+        ids = list(ids)
+        unique = list(dict.fromkeys(ids))
+        found = {}
+        for start in range(0, len(unique), chunk_size):
+            chunk = unique[start:start + chunk_size]
+            sql = statement("numeric", self.table_name, "select_in", n=len(chunk))
+            for row in self._query(sql, tuple(chunk), fetch=True, arraysize=len(chunk)) or []:
+                found[str(row_value(row, "id"))] = self.to_dict(row)
+        return [found.get(str(i)) for i in ids]
+
     def get_by_name(self, name):
         sql = f"SELECT * FROM {self.table_name} WHERE name = :1 AND ROWNUM = 1"
         rs = self._query(sql, (name,), fetch=True)
@@ -114,48 +305,89 @@ class OracleDAO:
 
     def update_by_id(self, id, vo):
         self.from_dict(vo)
-        keys = ", ".join([f"{k} = :{i + 1}" for i, k in enumerate(vo.keys())])
-        sql = f"UPDATE {self.table_name} SET {keys} WHERE id = :{len(vo) + 1}"
+        sql = statement("numeric", self.table_name, "update", tuple(vo))
         values = list(vo.values()) + [id]
-        self._query(sql, values)
-        self.conn.commit()
+        self._query(sql, values, commit=True)
         return True
 
     def persist(self, vo):
         self.from_dict(vo)
-        keys = ", ".join(vo.keys())
-        values_placeholder = ", ".join([f":{i + 1}" for i in range(len(vo))])
-        sql = f"INSERT INTO {self.table_name} ({keys}) VALUES ({values_placeholder})"
+        sql = statement("numeric", self.table_name, "insert", tuple(vo))
         values = list(vo.values())
 
-        cursor = self.conn.cursor()
-        try:
-            logger.debug(self._interpolate_sql(sql, values))
-            cursor.execute(sql, values)
-            self.conn.commit()
-            return cursor.lastrowid
-        finally:
-            cursor.close()
-
-    def persist_many(self, arr):
-        if not arr:
-            return False
-        keys = ", ".join(arr[0].keys())
-        values_placeholder = ", ".join([f":{i + 1}" for i in range(len(arr[0]))])
-        sql = f"INSERT INTO {self.table_name} ({keys}) VALUES ({values_placeholder})"
-        for item in arr:
-            self._query(sql, tuple(item.values()))
-        self.conn.commit()
-        return True
+        self._log_sql(sql, values)
+        with self._connection() as conn:
+            cursor = conn.cursor()
+            try:
+                cursor.execute(sql, values)
+                conn.commit()
+                count_cache.invalidate(self._count_namespace)
+                return cursor.lastrowid
+            finally:
+                cursor.close()
+
+    def persist_many(self, arr, batch_size=None):
+        """
+        Insert rows with array DML: one executemany round-trip per batch.
+
+        Batch errors are enabled, so a bad row does not abort its batch; the
+        other rows are inserted and committed. Every row must have the
+        columns of the first one.
+
+        Args:
+            arr (Iterable[dict]): rows, consumed lazily batch by batch
+            batch_size (int): rows per executemany, self.batch_size by default
+
+        Returns:
+            dict: {"affected": inserted rows, "errors": [{"index", "error"}]}
+            where index is the position of the failed row in arr
+        """
+        batch_size = batch_size or self.batch_size
+        rows = iter(arr)
+        first = next(rows, None)
+        result = {"affected": 0, "errors": []}
+        if first is None:
+            return result
+        first = self.from_dict(first)
+        keys = tuple(first.keys())
+        sql = statement("numeric", self.table_name, "insert", keys)
+
+        with self._connection() as conn:
+            cursor = conn.cursor()
+            try:
+                base = 0
+                batch = [tuple(first[k] for k in keys)]
+                for item in rows:
+                    item = self.from_dict(item)
+                    batch.append(tuple(item[k] for k in keys))
+                    if len(batch) >= batch_size:
+                        self._execute_many(conn, cursor, sql, batch, base, result)
+                        base += len(batch)
+                        batch = []
+                if batch:
+                    self._execute_many(conn, cursor, sql, batch, base, result)
+            finally:
+                cursor.close()
+        count_cache.invalidate(self._count_namespace)
+        return result
+
+    def _execute_many(self, conn, cursor, sql, batch, base, result):
+        logger.debug(f"{sql} | {len(batch)} rows")
+        cursor.executemany(sql, batch, batcherrors=True)
+        errors = cursor.getbatcherrors()
+        result["affected"] += len(batch) - len(errors)
+        for error in errors:
+            result["errors"].append({"index": base + error.offset, "error": error.message})
+        conn.commit()
 
     def delete_by_id(self, id):
-        sql = f"DELETE FROM {self.table_name} WHERE id = :1"
-        self._query(sql, (id,))
-        self.conn.commit()
+        sql = statement("numeric", self.table_name, "delete_by", key="id")
+        self._query(sql, (id,), commit=True)
+        count_cache.invalidate(self._count_namespace)
         return True
 
     def delete_all(self):
         sql = f"DELETE FROM {self.table_name}"
-        self._query(sql)
-        self.conn.commit()
+        self._query(sql, commit=True)
+        count_cache.invalidate(self._count_namespace)
         return True
@@ -0,0 +1,280 @@
+import base64
+import json
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+
+from marshmallow import EXCLUDE, Schema, fields
+
+import basic4web.config as base_config
+
+try:
+    from bson import ObjectId
+except ImportError:  # bson ships with the "mongo" extra
+    ObjectId = None
+
+COUNT_MODES = ("exact", "none", "estimated", "cached")
+
+
+class PageMetaSchema(Schema):
+    class Meta:
+        unknown = EXCLUDE
+
+    total_elements = fields.Integer()
+    page = fields.Integer()
+    per_page = fields.Integer()
+    next = fields.String(allow_none=True)
+    has_next = fields.Boolean()
+
+
+def _cursor_default(o):
+    if isinstance(o, datetime):
+        return {"$date": o.isoformat()}
+    if ObjectId is not None and isinstance(o, ObjectId):
+        return {"$oid": str(o)}
+    return str(o)
+
+
+def _cursor_hook(d):
+    if len(d) == 1:
+        if "$date" in d:
+            return datetime.fromisoformat(d["$date"])
+        if "$oid" in d and ObjectId is not None:
+            return ObjectId(d["$oid"])
+    return d
+
+
+def encode_cursor(values):
+    """
+    Encode the sort key of the last row of a page into an opaque token.
+
+    Args:
+        values (list): sort key values, the primary key last
+
+    Returns:
+        str: url-safe token for the ``after`` query argument
+    """
+    raw = json.dumps(values, default=_cursor_default, separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(token):
+    """
+    Decode an ``after`` token produced by ``encode_cursor``.
+
+    Tokens come from clients and their values end up in queries, so only
+    one or two scalar, ``$date`` or ``$oid`` values are accepted.
+
+    Raises:
+        ValueError: if the token is malformed
+    """
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        values = json.loads(raw, object_hook=_cursor_hook)
+    except (ValueError, TypeError) as e:
+        raise ValueError(f"invalid pagination cursor: {token}") from e
+    if not isinstance(values, list) or not 1 <= len(values) <= 2 or not all(map(_is_cursor_value, values)):
+        raise ValueError(f"invalid pagination cursor: {token}")
+    return values
+
+
+def _is_cursor_value(value):
+    # rejects nested documents such as {"$ne": null}
+    if value is None or isinstance(value, (str, int, float, datetime)):
+        return True
+    return ObjectId is not None and isinstance(value, ObjectId)
+
+
+def is_keyset(pagination):
+    return bool(pagination) and "after" in pagination
+
+
+def parse_order_by(order_by, pk):
+    """
+    Split a keyset ``order_by`` ("column" or "column DESC") into its parts.
+
+    Keyset pagination needs a single, deterministic sort column; the primary
+    key is always appended as tie-breaker.
+
+    Returns:
+        tuple: (column, descending)
+    """
+    if not order_by:
+        return pk, False
+    parts = order_by.split()
+    if "," in order_by or len(parts) > 2 or (len(parts) == 2 and parts[1].upper() not in ("ASC", "DESC")):
+        raise ValueError(f"keyset pagination needs a single sort column, got: {order_by}")
+    return parts[0], len(parts) == 2 and parts[1].upper() == "DESC"
+
+
+def keyset_sql(column, pk, descending, after, placeholder):
+    """
+    Build the WHERE and ORDER BY fragments of a keyset page.
+
+    Args:
+        column (str): sort column
+        pk (str): primary key column (tie-breaker)
+        descending (bool): sort direction
+        after (list): decoded cursor, None for the first page
+        placeholder: callable receiving the 1-based parameter position and
+            returning the driver placeholder ("?", "%s", ":1", ...)
+
+    Returns:
+        tuple: (where_sql or "", params, order_sql)
+    """
+    op = "<" if descending else ">"
+    direction = " DESC" if descending else ""
+    if column == pk:
+        order_sql = f"{pk}{direction}"
+        if after is None:
+            return "", [], order_sql
+        return f"{pk} {op} {placeholder(1)}", [after[-1]], order_sql
+
+    order_sql = f"{column}{direction}, {pk}{direction}"
+    if after is None:
+        return "", [], order_sql
+    value, last_pk = after[0], after[-1]
+    where_sql = (
+        f"({column} {op} {placeholder(1)} OR ({column} = {placeholder(2)} AND {pk} {op} {placeholder(3)}))"
+    )
+    return where_sql, [value, value, last_pk], order_sql
+
+
+def row_value(row, column):
+    if column in row:
+        return row[column]
+    return row.get(column.upper())
+
+
+def keyset_page(rows, per_page, column, pk):
+    """
+    Trim a page fetched with ``per_page + 1`` rows and compute the next token.
+
+    Returns:
+        tuple: (rows, next token or None)
+    """
+    rows, has_next = trim_page(rows, per_page)
+    if not has_next:
+        return rows, None
+    last = rows[-1]
+    values = [row_value(last, pk)] if column == pk else [row_value(last, column), row_value(last, pk)]
+    return rows, encode_cursor(values)
+
+
+def keyset_metadata(pagination, next_token):
+    meta = {k: v for k, v in pagination.items() if k != "after"}
+    meta["next"] = next_token
+    meta["has_next"] = next_token is not None
+    return meta
+
+
+def count_mode(pagination):
+    """
+    Get the count mode of a pagination dict.
+
+    exact: COUNT(*) / $count on every page (default)
+    none: no count, one extra row is fetched to fill ``has_next``
+    estimated: table statistics / estimated_document_count, falling back
+        to cached when the DAO has no estimate for the query
+    cached: exact count cached for COUNT_CACHE_TTL seconds, invalidated by
+        persist/delete_* on the same DAO table or collection
+    """
+    mode = (pagination or {}).get("count", "exact")
+    if mode not in COUNT_MODES:
+        raise ValueError(f"invalid count mode: {mode}")
+    return mode
+
+
+class CountCache:
+    """
+    Bounded LRU cache of exact counts, keyed by namespace (table/collection)
+    and filter.
+
+    Entries expire after COUNT_CACHE_TTL seconds and at most COUNT_CACHE_SIZE
+    of them are kept; expired entries are dropped on lookup and swept from
+    the least recently used end on every put.
+    """
+
+    def __init__(self, maxsize=None):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, namespace, where):
+        key = (namespace, json.dumps(where, sort_keys=True, default=str))
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[0] > time.time():
+                    self._entries.move_to_end(key)
+                    return entry[1]
+                del self._entries[key]
+        return None
+
+    def put(self, namespace, where, total, ttl=None):
+        key = (namespace, json.dumps(where, sort_keys=True, default=str))
+        ttl = base_config.get("COUNT_CACHE_TTL") if ttl is None else ttl
+        maxsize = base_config.get("COUNT_CACHE_SIZE") if self.maxsize is None else self.maxsize
+        now = time.time()
+        with self._lock:
+            self._entries[key] = (now + ttl, total)
+            self._entries.move_to_end(key)
+            while self._entries:
+                oldest = next(iter(self._entries.values()))
+                if oldest[0] > now and len(self._entries) <= maxsize:
+                    break
+                self._entries.popitem(last=False)
+
+    def get_or_count(self, namespace, where, exact, ttl=None):
+        total = self.get(namespace, where)
+        if total is None:
+            total = exact()
+            self.put(namespace, where, total, ttl)
+        return total
+
+    def invalidate(self, namespace):
+        with self._lock:
+            for key in [k for k in self._entries if k[0] == namespace]:
+                del self._entries[key]
+
+
+count_cache = CountCache()
+
+
+def resolve_total(pagination, namespace, exact, estimated=None, where=None):
+    """
+    Resolve total_elements according to the pagination count mode.
+
+    Args:
+        pagination (dict): pagination dict with an optional "count" mode
+        namespace (str): count cache namespace of the DAO table/collection
+        exact: callable returning the exact count
+        estimated: optional callable returning an estimate or None
+        where: filter the count applies to (part of the cache key)
+
+    Returns:
+        int: total, or None in "none" mode
+    """
+    mode = count_mode(pagination)
+    if mode == "none":
+        return None
+    if mode == "exact":
+        return exact()
+    if mode == "estimated" and estimated is not None:
+        total = estimated()
+        if total is not None:
+            return total
+    return count_cache.get_or_count(namespace, where, exact)
+
+
+def trim_page(rows, per_page):
+    """
+    Trim a page fetched with ``per_page + 1`` rows.
+
+    Returns:
+        tuple: (rows, has_next)
+    """
+    if len(rows) > per_page:
+        return rows[:per_page], True
+    return rows, False
@@ -0,0 +1,225 @@
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+from basic4web.middleware.logging import logger
+
+
+class ConnectionPool:
+    """
+    Thread-safe pool of DB-API connections.
+
+    Connections are created lazily up to ``max_size``; ``min_size`` of them
+    are opened on first use. On checkout, a connection older than
+    ``max_lifetime`` seconds is recycled, and one idle for longer than
+    ``ping_interval`` seconds is checked with ``ping`` and replaced if it is
+    dead. ``transaction`` binds one connection to the calling thread, and
+    ``acquire`` returns that connection until the transaction ends, so DAOs
+    sharing the pool take part in the same transaction.
+
+    Connections inherited through fork() are discarded in the child.
+    """
+
+    def __init__(self, factory, min_size=1, max_size=10, max_lifetime=3600, ping=None, ping_interval=5,
+                 timeout=30):
+        self._factory = factory
+        self.min_size = min_size
+        self.max_size = max_size
+        self.max_lifetime = max_lifetime
+        self._ping = ping
+        self.ping_interval = ping_interval
+        self.timeout = timeout
+        self._reset()
+
+    def _reset(self):
+        # sockets belong to the parent after fork(): never reuse or close them
+        self._idle = deque()
+        self._created = {}
+        self._opening = 0
+        self._cond = threading.Condition()
+        self._local = threading.local()
+        self._pid = os.getpid()
+        self._filled = False
+        self._closed = False
+
+    def _open(self):
+        # the caller reserved a slot with _opening += 1 under the lock
+        try:
+            conn = self._factory()
+        except BaseException:
+            with self._cond:
+                self._opening -= 1
+                self._cond.notify()
+            raise
+        with self._cond:
+            self._opening -= 1
+            self._created[id(conn)] = time.monotonic()
+        return conn
+
+    def _close(self, conn):
+        try:
+            conn.close()
+        except Exception as e:
+            logger.debug(f"error closing pooled connection: {e}")
+
+    def _expired(self, conn, now):
+        return self.max_lifetime and now - self._created.get(id(conn), now) > self.max_lifetime
+
+    def _alive(self, conn):
+        try:
+            self._ping(conn)
+            return True
+        except Exception:
+            return False
+
+    def acquire(self):
+        bound = getattr(self._local, "conn", None)
+        if bound is not None:
+            return bound
+        if self._pid != os.getpid():
+            self._reset()
+        if not self._filled:
+            self.fill()
+        with self._cond:
+            entry = self._checkout(time.monotonic() + self.timeout)
+        if entry is None:
+            return self._open()
+        conn, released = entry
+        now = time.monotonic()
+        if not self._expired(conn, now) and (
+                not self._ping or now - released <= self.ping_interval or self._alive(conn)
+        ):
+            return conn
+        # recycle it, keeping its slot reserved for the replacement
+        with self._cond:
+            del self._created[id(conn)]
+            self._opening += 1
+        self._close(conn)
+        return self._open()
+
+    def _checkout(self, deadline):
+        # called with the lock held; None means a slot was reserved for _open
+        while not self._idle:
+            if len(self._created) + self._opening < self.max_size:
+                self._opening += 1
+                return None
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or not self._cond.wait(remaining):
+                raise TimeoutError(f"no connection available after {self.timeout}s (max_size={self.max_size})")
+        return self._idle.pop()
+
+    def fill(self):
+        """Opens connections until min_size are in the pool."""
+        while True:
+            # one slot at a time: a failing open leaves no reservation behind,
+            # and the pool is filled again on the next acquire()
+            with self._cond:
+                if len(self._created) + self._opening >= self.min_size:
+                    self._filled = True
+                    return
+                self._opening += 1
+            conn = self._open()
+            with self._cond:
+                self._idle.append((conn, time.monotonic()))
+                self._cond.notify()
+
+    def release(self, conn, discard=False):
+        if conn is getattr(self._local, "conn", None):
+            return
+        with self._cond:
+            if id(conn) not in self._created:
+                # opened before a fork or already discarded
+                return
+            discard = discard or self._closed or self._expired(conn, time.monotonic())
+            if discard:
+                del self._created[id(conn)]
+            else:
+                self._idle.append((conn, time.monotonic()))
+            self._cond.notify()
+        if discard:
+            self._close(conn)
+
+    @contextmanager
+    def connection(self):
+        conn = self.acquire()
+        discard = False
+        try:
+            yield conn
+        except Exception:
+            discard = not self._alive(conn) if self._ping else False
+            raise
+        finally:
+            self.release(conn, discard=discard)
+
+    def in_transaction(self):
+        return getattr(self._local, "conn", None) is not None
+
+    @contextmanager
+    def transaction(self):
+        """
+        Runs the block in a transaction on a connection bound to this thread.
+
+        Nested calls join the outer transaction; the outermost block commits,
+        or rolls back if it raises.
+        """
+        if self.in_transaction():
+            yield self._local.conn
+            return
+        conn = self.acquire()
+        self._local.conn = conn
+        try:
+            begin = getattr(conn, "begin", None)
+            if begin:
+                begin()
+            yield conn
+            conn.commit()
+        except BaseException:
+            try:
+                conn.rollback()
+            except Exception as e:
+                logger.error(f"rollback failed: {e}")
+            raise
+        finally:
+            self._local.conn = None
+            self.release(conn)
+
+    def close_all(self):
+        """Close idle connections; checked out ones are closed on release."""
+        with self._cond:
+            self._closed = True
+            idle = [conn for conn, _ in self._idle]
+            self._idle.clear()
+            for conn in idle:
+                del self._created[id(conn)]
+        for conn in idle:
+            self._close(conn)
+
+    def stats(self):
+        with self._cond:
+            return {"size": len(self._created), "idle": len(self._idle), "max_size": self.max_size}
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(key, factory, **options):
+    """
+    Get the process-wide pool for key (e.g. a DSN tuple), creating it with
+    factory and options on first use.
+    """
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None:
+            pool = _pools[key] = ConnectionPool(factory, **options)
+        return pool
+
+
+def close_pools():
+    with _pools_lock:
+        pools = list(_pools.values())
+        _pools.clear()
+    for pool in pools:
+        pool.close_all()
@@ -36,6 +36,11 @@ class RedisDAO:
     def get_by_id(self, k):
         return self.conn.get(k)
 
+    def get_by_ids(self, keys):
+        """Fetch several keys with one MGET; values in key order, None when missing."""
+        keys = list(keys)
+        return self.conn.mget(keys) if keys else []
+
     def delete(self, k):
         self.conn.delete(k)
 
@@ -1,8 +1,232 @@
+import atexit
+import logging
+import os
+import queue
 import sqlite3
+import threading
+from concurrent.futures import Future
 
 from marshmallow import Schema, fields
 
+import basic4web.config as base_config
 from basic4web.middleware.logging import logger
+from basic4web.repository.pagination import (
+    count_cache,
+    count_mode,
+    is_keyset,
+    keyset_metadata,
+    keyset_page,
+    keyset_sql,
+    parse_order_by,
+    resolve_total,
+    row_value,
+    trim_page,
+)
+from basic4web.repository.statements import statement
+
+
+def _open(path, **kwargs):
+    conn = sqlite3.connect(
+        path,
+        timeout=300,
+        cached_statements=base_config.get("SQLITE_CACHED_STATEMENTS", 256),
+        **kwargs,
+    )
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA synchronous = NORMAL")
+    conn.execute(f"PRAGMA mmap_size = {int(base_config.get('SQLITE_MMAP_SIZE', 256 * 1024 * 1024))}")
+    conn.execute(f"PRAGMA cache_size = {int(base_config.get('SQLITE_CACHE_SIZE', -64 * 1024))}")
+    return conn
+
+
+class SQLiteWriter:
+    """
+    Single writer thread of a database file in concurrency mode.
+
+    Write jobs (callables receiving the writer connection) are queued and
+    applied by one thread, so writers never contend for the database lock.
+    Jobs waiting in the queue are group-committed: up to batch_size of them
+    run in one transaction, each inside its own SAVEPOINT, so a failing job
+    is rolled back alone and reports its exception to its caller. Callers
+    get their result only after the transaction is committed.
+
+    The connection is opened by the constructor, so open errors are raised
+    to the caller. If the writer thread stops on an unexpected error, queued
+    and later writes fail with that error instead of waiting forever; so do
+    writes submitted after close() or from a forked child, where the thread
+    no longer runs.
+    """
+
+    def __init__(self, path, batch_size=None):
+        self.path = path
+        self.batch_size = batch_size or base_config.get("SQLITE_GROUP_COMMIT_SIZE", 100)
+        self._queue = queue.Queue()
+        self._conn = _open(path, isolation_level=None, check_same_thread=False)
+        try:
+            self._conn.execute("PRAGMA journal_mode = WAL")
+        except sqlite3.Error:
+            self._conn.close()
+            raise
+        self._error = None
+        self._error_lock = threading.Lock()
+        self._pid = os.getpid()
+        self._thread = threading.Thread(target=self._run, name=f"sqlite-writer:{path}", daemon=True)
+        self._thread.start()
+
+    def submit(self, fn):
+        """Run fn(conn) on the writer thread and return its result once committed."""
+        if threading.current_thread() is self._thread:
+            # nested write from inside a job: already in its transaction
+            return fn(self._conn)
+        future = Future()
+        with self._error_lock:
+            if self._pid != os.getpid():
+                raise RuntimeError(f"sqlite writer of {self.path} belongs to the parent process")
+            if self._error is not None:
+                raise self._error
+            self._queue.put((fn, future))
+        return future.result()
+
+    @property
+    def alive(self):
+        return self._error is None and self._pid == os.getpid()
+
+    def close(self):
+        with self._error_lock:
+            if self._error is not None:
+                return
+            self._error = RuntimeError(f"sqlite writer of {self.path} is closed")
+            if self._pid != os.getpid():
+                return
+            self._queue.put(None)
+        self._thread.join()
+
+    def _run(self):
+        try:
+            self._loop()
+        except BaseException as e:
+            logger.error(f"sqlite writer of {self.path} stopped: {e}")
+            with self._error_lock:
+                self._error = e
+            with _writers_lock:
+                # the next get_writer() starts a fresh writer
+                if _writers.get(self.path) is self:
+                    del _writers[self.path]
+            while True:
+                try:
+                    job = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if job is not None:
+                    job[1].set_exception(e)
+        finally:
+            self._conn.close()
+
+    def _loop(self):
+        running = True
+        while running:
+            job = self._queue.get()
+            if job is None:
+                break
+            jobs = [job]
+            while len(jobs) < self.batch_size:
+                try:
+                    job = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if job is None:
+                    running = False
+                    break
+                jobs.append(job)
+            try:
+                self._commit_group(jobs)
+            except BaseException as e:
+                for _, future in jobs:
+                    if not future.done():
+                        future.set_exception(e)
+                raise
+
+    def _commit_group(self, jobs):
+        conn = self._conn
+        outcomes = []
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            for fn, future in jobs:
+                conn.execute("SAVEPOINT job")
+                try:
+                    outcomes.append((future, fn(conn), None))
+                except Exception as e:
+                    conn.execute("ROLLBACK TO job")
+                    outcomes.append((future, None, e))
+                conn.execute("RELEASE job")
+            conn.execute("COMMIT")
+        except Exception as e:
+            logger.error(f"group commit of {len(jobs)} writes failed: {e}")
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            for _, future in jobs:
+                future.set_exception(e)
+            return
+        for future, result, error in outcomes:
+            if error is None:
+                future.set_result(result)
+            else:
+                future.set_exception(error)
+
+
+_writers = {}
+_writers_lock = threading.Lock()
+_readers = threading.local()
+
+
+def get_writer(path):
+    with _writers_lock:
+        writer = _writers.get(path)
+    if writer is not None and writer.alive:
+        return writer
+    # opened outside the lock: a slow or failing file must not block the other databases
+    writer = SQLiteWriter(path)
+    with _writers_lock:
+        current = _writers.get(path)
+        if current is None or not current.alive:
+            current = _writers[path] = writer
+    if current is not writer:
+        writer.close()
+    return current
+
+
+def _reader(path):
+    # one read connection per thread and database file
+    conns = getattr(_readers, "conns", None)
+    if conns is None:
+        conns = _readers.conns = {}
+    conn = conns.get(path)
+    if conn is None:
+        conn = conns[path] = _open(path)
+        conn.execute("PRAGMA query_only = ON")
+    return conn
+
+
+@atexit.register
+def close_writers():
+    """Flush the queued writes and stop the writer threads."""
+    with _writers_lock:
+        writers = list(_writers.values())
+        _writers.clear()
+    for writer in writers:
+        writer.close()
+
+
+def _forget_writers():
+    # writer threads do not survive fork(): the child starts its own
+    global _writers_lock, _readers
+    _writers.clear()
+    _writers_lock = threading.Lock()
+    _readers = threading.local()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_forget_writers)
 
 
 class SQLite3DAO:
@@ -14,8 +238,23 @@ class SQLite3DAO:
             schema: type[Schema] | None = None,
             conn: sqlite3.Connection | None = None,
             auto_commit: bool = True,
+            concurrent: bool | None = None,
     ):
+        """
+        concurrent (SQLITE_CONCURRENT by default) enables the high-concurrency
+        mode for multi-threaded use: WAL journal, synchronous=NORMAL, mmap and
+        cache_size pragmas (SQLITE_MMAP_SIZE, SQLITE_CACHE_SIZE), one read
+        connection per thread and all writes applied by a single writer
+        thread with group commit (SQLITE_GROUP_COMMIT_SIZE writes per
+        transaction). Every write is committed when its method returns, so
+        auto_commit and commit() have no effect in this mode.
+        """
+        self.concurrent = base_config.get("SQLITE_CONCURRENT", False) if concurrent is None else concurrent
+        if self.concurrent and conn is not None:
+            raise ValueError("a connection cannot be passed in concurrent mode")
+        self._writer = None
         self.table_name = table_name
+        self._count_namespace = f"sqlite:{db_path}/{table_name}"
         self.schema = schema() if schema else None
         self.pageSchema = None
         self.db_path = db_path
@@ -34,12 +273,27 @@ class SQLite3DAO:
             self.pageSchema = page_class()
 
     def connect(self) -> None:
+        if self.concurrent:
+            if self._writer is None:
+                self._writer = get_writer(self._path)
+            return
         if not self.is_connected():
             logger.debug(f"SQLite3DAO: {self.db_path}/app.sqlite")
-            self.conn = sqlite3.connect(f"{self.db_path}/app.sqlite", timeout=300, check_same_thread=False)
+            self.conn = sqlite3.connect(
+                self._path,
+                timeout=300,
+                check_same_thread=False,
+                cached_statements=base_config.get("SQLITE_CACHED_STATEMENTS", 256),
+            )
             self.conn.row_factory = sqlite3.Row
 
+    @property
+    def _path(self):
+        return f"{self.db_path}/app.sqlite"
+
     def is_connected(self) -> bool:
+        if self.concurrent:
+            return self._writer is not None
         return self.conn is not None
 
     def __enter__(self):
@@ -47,6 +301,9 @@ class SQLite3DAO:
         return self
 
     def __exit__(self, exc_type, exc_val, exc_tb):
+        if self.concurrent:
+            # shared connections stay open; writes are already committed
+            return
         try:
             if exc_type is not None:
                 self.conn.rollback()
@@ -57,7 +314,19 @@ class SQLite3DAO:
 
     def commit(self):
         logger.debug(f"[{self.auto_commit}] commit")
-        self.conn.commit()
+        if not self.concurrent:
+            self.conn.commit()
+
+    def _read_conn(self):
+        return _reader(self._path) if self.concurrent else self.conn
+
+    def _write(self, fn):
+        """Run fn(conn) as a write: on the writer thread in concurrent mode, else on self.conn."""
+        if self.concurrent:
+            # looked up on every write: the writer may have been closed or lost to fork()
+            self._writer = get_writer(self._path)
+            return self._writer.submit(fn)
+        return fn(self.conn)
 
     def to_dict(self, row):
         return dict(row) if row else row
@@ -80,44 +349,133 @@ class SQLite3DAO:
         except Exception as e:
             return f"{sql} | PARAMS: {params} | {e}"
 
+    def _log_sql(self, sql, params):
+        # interpolating parameters is costly: only do it when debug is on
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(self._interpolate_sql(sql, params), stacklevel=2)
+
     def _query(self, sql, params=(), fetch=False):
-        cursor = self.conn.cursor()
-        logger.debug(self._interpolate_sql(sql, params))
+        self._log_sql(sql, params)
+        if not fetch:
+            self._write(lambda conn: self._execute(conn, sql, params))
+            return None
+        cursor = self._read_conn().cursor()
         try:
             cursor.execute(sql, params)
-            if fetch:
-                rows = cursor.fetchall()
-                return [dict(row) for row in rows]
+            rows = cursor.fetchall()
+            return [dict(row) for row in rows]
+        finally:
+            cursor.close()
+
+    def _execute(self, conn, sql, params=(), many=False):
+        cursor = conn.cursor()
+        try:
+            if many:
+                cursor.executemany(sql, params)
+            else:
+                cursor.execute(sql, params)
+            return cursor.lastrowid if not many else cursor.rowcount
         finally:
             cursor.close()
 
     def get_all(self, pagination=None, order_by=None):
+        if is_keyset(pagination):
+            return self._get_keyset(pagination, order_by)
+
         sql = f"SELECT * FROM {self.table_name}"
         if order_by:
             sql += f" ORDER BY {order_by}"
-        count_sql = f"SELECT COUNT(*) AS total FROM {self.table_name}"
         rows = []
-        total = self._query(count_sql, fetch=True)[0]["total"]
 
         if pagination:
             page = pagination.get("page", 1)
             per_page = pagination.get("per_page", 10)
             offset = (page - 1) * per_page
-            sql += f" LIMIT {per_page} OFFSET {offset}"
-            pagination["total_elements"] = total
-        else:
-            pagination = {"total_elements": total, "page": 1, "per_page": total}
+            mode = count_mode(pagination)
+            limit = per_page + 1 if mode == "none" else per_page
+            sql += f" LIMIT {limit} OFFSET {offset}"
 
         rs = self._query(sql, fetch=True)
         if rs:
             rows = [row for row in rs]
             for r in rows:
                 self.to_dict(r)
+
+        if pagination:
+            if mode == "none":
+                rows, pagination["has_next"] = trim_page(rows, per_page)
+            else:
+                pagination["total_elements"] = self._total(pagination)
+        else:
+            total = len(rows)
+            pagination = {"total_elements": total, "page": 1, "per_page": total}
         return {
             "metadata": pagination,
             "data": rows,
         }
 
+    def iter_all(self, where=None, params=(), order_by=None, batch_size=1000):
+        """
+        Yield rows lazily, fetching batch_size rows at a time.
+
+        Unlike get_all, memory stays flat whatever the table size; pass the
+        generator to base_controller.response_stream to export a table.
+
+        Args:
+            where (str): optional WHERE clause with ? placeholders
+            params (tuple): parameters of the WHERE clause
+            order_by (str): optional ORDER BY clause
+            batch_size (int): rows per fetchmany call
+        """
+        sql = f"SELECT * FROM {self.table_name}"
+        if where:
+            sql += f" WHERE {where}"
+        if order_by:
+            sql += f" ORDER BY {order_by}"
+        self._log_sql(sql, params)
+        cursor = self._read_conn().cursor()
+        try:
+            cursor.execute(sql, params or ())
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                for row in rows:
+                    yield self.to_dict(row)
+        finally:
+            cursor.close()
+
+    def _total(self, pagination):
+        return resolve_total(pagination, self._count_namespace, self.count_all, estimated=self._estimated_count)
+
+    def _estimated_count(self):
+        # row count recorded by ANALYZE, None when statistics are missing
+        try:
+            rs = self._query("SELECT stat FROM sqlite_stat1 WHERE tbl = ? LIMIT 1", (self.table_name,), fetch=True)
+        except sqlite3.Error:
+            return None
+        return int(rs[0]["stat"].split()[0]) if rs else None
+
+    def _get_keyset(self, pagination, order_by=None):
+        column, descending = parse_order_by(order_by, "_id")
+        per_page = pagination.get("per_page", 10)
+        where_sql, params, order_sql = keyset_sql(
+            column, "_id", descending, pagination.get("after"), lambda i: "?"
+        )
+        sql = f"SELECT * FROM {self.table_name}"
+        if where_sql:
+            sql += f" WHERE {where_sql}"
+        sql += f" ORDER BY {order_sql} LIMIT {per_page + 1}"
+        rows, next_token = keyset_page(self._query(sql, params, fetch=True) or [], per_page, column, "_id")
+        metadata = keyset_metadata(pagination, next_token)
+        total = self._total(pagination)
+        if total is not None:
+            metadata["total_elements"] = total
+        return {
+            "metadata": metadata,
+            "data": [self.to_dict(r) for r in rows],
+        }
+
     def get_desc_by_id(self, _id):
         sql = f"SELECT _id,name FROM {self.table_name} WHERE _id = ?"
         rs = self._query(sql, (_id,), fetch=True)
@@ -126,12 +484,30 @@ class SQLite3DAO:
         return row
 
     def get_by_id(self, _id):
-        sql = f"SELECT * FROM {self.table_name} WHERE _id = ?"
+        sql = statement("qmark", self.table_name, "select_by", key="_id")
         rs = self._query(sql, (_id,), fetch=True)
         row = rs[0] if rs else None
         self.to_dict(row)
         return row
 
+    def get_by_ids(self, ids, chunk_size=500):
+        """
+        Fetch several rows with chunked IN (...) queries.
+        chunk_size stays below the SQLite host parameter limit (999 on older builds).
+
+        Returns:
+            list: rows in the order of ids, None where not found
+        """
+        ids = list(ids)
+        unique = list(dict.fromkeys(ids))
+        found = {}
+        for start in range(0, len(unique), chunk_size):
+            chunk = unique[start:start + chunk_size]
+            sql = statement("qmark", self.table_name, "select_in", key="_id", n=len(chunk))
+            for row in self._query(sql, tuple(chunk), fetch=True) or []:
+                found[str(row_value(row, "_id"))] = self.to_dict(row)
+        return [found.get(str(i)) for i in ids]
+
     def get_by_name(self, name):
         sql = f"SELECT * FROM {self.table_name} WHERE name = ? LIMIT 1"
         rs = self._query(sql, (name,), fetch=True)
@@ -141,8 +517,7 @@ class SQLite3DAO:
 
     def update_by_id(self, _id, vo):
         self.from_dict(vo)
-        keys = ", ".join([f"{k} = ?" for k in vo.keys()])
-        sql = f"UPDATE {self.table_name} SET {keys} WHERE _id = ?"
+        sql = statement("qmark", self.table_name, "update", tuple(vo), key="_id")
         values = list(vo.values()) + [_id]
         self._query(sql, values)
         if self.auto_commit:
@@ -151,63 +526,183 @@ class SQLite3DAO:
 
     def persist(self, vo):
         vo = self.from_dict(vo)
-        keys = ", ".join(vo.keys())
-        values_placeholder = ", ".join(["?"] * len(vo))
-        sql = f"INSERT INTO {self.table_name} ({keys}) VALUES ({values_placeholder})"
+        sql = statement("qmark", self.table_name, "insert", tuple(vo))
         values = list(vo.values())
-        logger.debug(self._interpolate_sql(sql, values))
-        cursor = self.conn.cursor()
-        try:
-            cursor.execute(sql, values)
-            if self.auto_commit:
-                self.commit()
-            return cursor.lastrowid
-        finally:
-            cursor.close()
+        self._log_sql(sql, values)
+        rowid = self._write(lambda conn: self._execute(conn, sql, values))
+        if self.auto_commit:
+            self.commit()
+        count_cache.invalidate(self._count_namespace)
+        return rowid
 
     def persist_many(self, arr):
         if not arr:
             return False
 
         first_vo = self.from_dict(arr[0])
-        keys = ", ".join(first_vo.keys())
-        values_placeholder = ", ".join(["?"] * len(first_vo))
-        sql = f"INSERT INTO {self.table_name} ({keys}) VALUES ({values_placeholder})"
+        sql = statement("qmark", self.table_name, "insert", tuple(first_vo))
 
         values_list = [tuple(self.from_dict(vo).values()) for vo in arr]
-        logger.debug(self._interpolate_sql(sql, values_list))
-        cursor = self.conn.cursor()
+        logger.debug(f"{sql} | {len(values_list)} rows")
         try:
-            cursor.executemany(sql, values_list)
+            rowcount = self._write(lambda conn: self._execute(conn, sql, values_list, many=True))
             if self.auto_commit:
                 self.commit()
-            return cursor.rowcount
+            count_cache.invalidate(self._count_namespace)
+            return rowcount
         except Exception:
-            self.conn.rollback()
+            if not self.concurrent:
+                self.conn.rollback()
             return False
+
+    def bulk_load(self, rows, chunk_size=5000, mode="insert", conflict=("_id",), rebuild_indexes=False,
+                  on_progress=None):
+        """
+        Load rows from any iterable in chunked transactions.
+
+        Rows are consumed lazily (e.g. from a CSV or NDJSON reader), so memory
+        stays flat. Each chunk is one executemany in its own transaction; if it
+        fails, the chunk is replayed row by row to load the valid rows and
+        report the failing ones. Every row must have the columns of the first
+        one; rows with missing or extra columns, or rejected by from_dict, are
+        reported as failed. In concurrent mode each chunk is a job of the
+        writer thread.
+
+        Args:
+            rows (Iterable[dict]): rows to load
+            chunk_size (int): rows per transaction
+            mode (str): "insert", "replace" (INSERT OR REPLACE) or "upsert"
+                (INSERT ... ON CONFLICT DO UPDATE of the other columns)
+            conflict (tuple): conflict target columns of the upsert mode
+            rebuild_indexes (bool): drop the non-unique indexes of the table
+                before the load and recreate them after it
+            on_progress (callable): called after every chunk with a dict
+                {"chunk", "loaded", "failed"} of running totals
+
+        Returns:
+            dict: {"loaded": rows loaded, "chunks": chunk count,
+            "failed": [{"index", "row", "error"}]}
+        """
+        if mode not in ("insert", "replace", "upsert"):
+            raise ValueError(f"unsupported bulk_load mode: {mode}")
+        report = {"loaded": 0, "chunks": 0, "failed": []}
+        rows = iter(rows)
+        first = next(rows, None)
+        if first is None:
+            return report
+        first = self.from_dict(first)
+        keys = tuple(first.keys())
+        sql = statement("qmark", self.table_name, "insert", keys)
+        if mode == "replace":
+            sql = sql.replace("INSERT INTO", "INSERT OR REPLACE INTO", 1)
+        elif mode == "upsert":
+            updates = ", ".join(f"{k} = excluded.{k}" for k in keys if k not in conflict)
+            action = f"DO UPDATE SET {updates}" if updates else "DO NOTHING"
+            sql += f" ON CONFLICT ({', '.join(conflict)}) {action}"
+        logger.debug(f"{sql} | bulk load in chunks of {chunk_size}")
+
+        indexes = self._drop_indexes() if rebuild_indexes else []
+        try:
+            base = 0
+            chunk = [(first, tuple(first[k] for k in keys), None)]
+            for row in rows:
+                chunk.append((row, *self._load_values(keys, row)))
+                if len(chunk) >= chunk_size:
+                    self._load_chunk(sql, keys, chunk, base, report, on_progress)
+                    base += len(chunk)
+                    chunk = []
+            if chunk:
+                self._load_chunk(sql, keys, chunk, base, report, on_progress)
         finally:
-            cursor.close()
+            if indexes:
+                self._create_indexes(indexes)
+            count_cache.invalidate(self._count_namespace)
+        return report
+
+    def _load_values(self, keys, row):
+        # (values, None) for a valid row, (None, error) otherwise
+        try:
+            vo = self.from_dict(row)
+        except Exception as e:
+            return None, str(e)
+        missing = [k for k in keys if k not in vo]
+        unexpected = [k for k in vo if k not in keys]
+        if missing or unexpected:
+            return None, f"columns differ from the first row: missing {missing}, unexpected {unexpected}"
+        return tuple(vo[k] for k in keys), None
+
+    def _load_chunk(self, sql, keys, chunk, base, report, on_progress):
+        rejected = [
+            {"index": base + i, "row": row, "error": error}
+            for i, (row, _, error) in enumerate(chunk)
+            if error is not None
+        ]
+        valid = [(base + i, row, values) for i, (row, values, error) in enumerate(chunk) if error is None]
+
+        def load(conn):
+            failed = []
+            conn.execute("SAVEPOINT bulk_chunk")
+            try:
+                conn.executemany(sql, [values for _, _, values in valid])
+            except sqlite3.Error:
+                conn.execute("ROLLBACK TO bulk_chunk")
+                # replay row by row to keep the valid rows and find the bad ones
+                for index, row, values in valid:
+                    try:
+                        conn.execute(sql, values)
+                    except sqlite3.Error as e:
+                        failed.append({"index": index, "row": row, "error": str(e)})
+            conn.execute("RELEASE bulk_chunk")
+            return failed
+
+        failed = self._write(load) if valid else []
+        if not self.concurrent:
+            self.conn.commit()
+        failed = sorted(rejected + failed, key=lambda f: f["index"])
+        report["chunks"] += 1
+        report["loaded"] += len(chunk) - len(failed)
+        report["failed"].extend(failed)
+        if on_progress:
+            on_progress({"chunk": report["chunks"], "loaded": report["loaded"], "failed": len(report["failed"])})
+
+    def _drop_indexes(self):
+        # unique indexes stay: they enforce constraints and conflict targets
+        rs = self._query(
+            "SELECT name, sql FROM sqlite_master WHERE type = 'index' AND tbl_name = ? AND sql IS NOT NULL",
+            (self.table_name,),
+            fetch=True,
+        )
+        indexes = [r for r in rs if not r["sql"].upper().startswith("CREATE UNIQUE")]
+        for index in indexes:
+            self.ddl(f'DROP INDEX "{index["name"]}"')
+        return indexes
+
+    def _create_indexes(self, indexes):
+        for index in indexes:
+            self.ddl(index["sql"])
+        if not self.concurrent:
+            self.conn.commit()
 
     def delete_by_id(self, _id):
-        sql = f"DELETE FROM {self.table_name} WHERE _id = ?"
+        sql = statement("qmark", self.table_name, "delete_by", key="_id")
         self._query(sql, (_id,))
+        count_cache.invalidate(self._count_namespace)
         return True
 
     def delete_all(self):
         sql = f"DELETE FROM {self.table_name}"
         self._query(sql)
+        count_cache.invalidate(self._count_namespace)
         return True
 
     def ddl(self, sql):
         logger.debug(sql)
-        cursor = self.conn.cursor()
-        cursor.execute(sql)
-        cursor.close()
+        self._write(lambda conn: conn.execute(sql).close())
 
     def count_all(self, where_clause=None, params=None):
         sql = f"SELECT COUNT(*) AS total FROM {self.table_name}"
         if where_clause:
             sql += f" WHERE {where_clause}"
         logger.debug(sql)
-        result = self._query(sql, params, fetch=True)
+        result = self._query(sql, params or (), fetch=True)
         return result[0]["total"] if result else 0
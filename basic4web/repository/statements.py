@@ -0,0 +1,44 @@
+from functools import lru_cache
+
+_PLACEHOLDERS = {
+    "qmark": lambda i: "?",
+    "format": lambda i: "%s",
+    "numeric": lambda i: f":{i}",
+}
+
+
+@lru_cache(maxsize=1024)
+def statement(style, table, op, cols=(), key="id", n=0):
+    """
+    SQL text of a DAO operation, built once per (style, table, op, cols).
+
+    Keeping the text stable also lets the driver statement caches (sqlite3
+    cached_statements, Oracle stmtcachesize) reuse the prepared statement.
+
+    Args:
+        style (str): placeholder style, "qmark" (?), "format" (%s) or
+            "numeric" (:1)
+        table (str): table name
+        op (str): insert, update, select_by, delete_by or select_in
+        cols (tuple): inserted/updated columns
+        key (str): column of the WHERE clause
+        n (int): number of values of select_in
+
+    Returns:
+        str: the statement
+    """
+    ph = _PLACEHOLDERS[style]
+    if op == "insert":
+        values = ", ".join(ph(i + 1) for i in range(len(cols)))
+        return f"INSERT INTO {table} ({', '.join(cols)}) VALUES ({values})"
+    if op == "update":
+        assignments = ", ".join(f"{c} = {ph(i + 1)}" for i, c in enumerate(cols))
+        return f"UPDATE {table} SET {assignments} WHERE {key} = {ph(len(cols) + 1)}"
+    if op == "select_by":
+        return f"SELECT * FROM {table} WHERE {key} = {ph(1)}"
+    if op == "delete_by":
+        return f"DELETE FROM {table} WHERE {key} = {ph(1)}"
+    if op == "select_in":
+        values = ", ".join(ph(i + 1) for i in range(n))
+        return f"SELECT * FROM {table} WHERE {key} IN ({values})"
+    raise ValueError(f"unknown statement: {op}")
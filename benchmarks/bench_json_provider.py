@@ -0,0 +1,76 @@
+"""
+Compare the JSON response paths on a 10k-row ``get_all`` payload.
+
+    python benchmarks/bench_json_provider.py [rows] [repeat]
+
+``legacy`` is what services do today: ``deep_date_str`` on every row and
+``jsonify`` through Flask's default provider. ``provider`` encodes the raw
+rows with ``FastJSONProvider`` (stdlib encoder); ``provider+orjson`` is the
+same provider with the C accelerator, when installed.
+"""
+import sys
+import timeit
+from datetime import datetime, timedelta
+
+from bson import ObjectId
+from flask import Flask, jsonify
+from flask.json.provider import DefaultJSONProvider
+
+from basic4web.common_utils import deep_date_str
+from basic4web.middleware.json_provider import FastJSONProvider, init_json_provider
+
+
+def make_page(rows):
+    now = datetime(2024, 1, 1)
+    data = [
+        {
+            "_id": ObjectId(),
+            "name": f"item-{i}",
+            "created_at": now + timedelta(seconds=i),
+            "updated_at": now + timedelta(seconds=i, minutes=5),
+            "tags": ["a", "b", "c"],
+            "owner": {"_id": ObjectId(), "name": "owner", "since": now},
+            "score": i * 0.5,
+            "active": i % 2 == 0,
+        }
+        for i in range(rows)
+    ]
+    return {"metadata": {"total_elements": rows, "page": 1, "per_page": rows}, "data": data}
+
+
+def legacy(page):
+    rows = []
+    for r in page["data"]:
+        r = deep_date_str(r)
+        r["_id"] = str(r["_id"])
+        r["owner"]["_id"] = str(r["owner"]["_id"])
+        rows.append(r)
+    return jsonify({"metadata": page["metadata"], "data": rows}).get_data()
+
+
+def provider(page):
+    return jsonify(page).get_data()
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    repeat = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+    page = make_page(rows)
+    app = Flask(__name__)
+
+    cases = [("legacy", DefaultJSONProvider, None, legacy), ("provider", FastJSONProvider, False, provider)]
+    if FastJSONProvider.use_orjson:
+        cases.append(("provider+orjson", FastJSONProvider, True, provider))
+
+    for name, provider_class, use_orjson, fn in cases:
+        app.json = provider_class(app) if provider_class is DefaultJSONProvider else init_json_provider(app)
+        if use_orjson is not None:
+            app.json.use_orjson = use_orjson
+        with app.app_context():
+            best = min(timeit.repeat(lambda: fn(page), number=1, repeat=repeat))
+            size = len(fn(page))
+        print(f"{name:<16} {best * 1000:9.1f} ms  {size / 1024:9.1f} KiB  ({rows} rows)")
+
+
+if __name__ == "__main__":
+    main()
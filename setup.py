@@ -30,6 +30,8 @@ setup(
         ],
         "oracle": ["cx_Oracle~=8.3.0"],
         "mongo": ["pymongo>=4.5.0"],
+        "mongo-async": ["pymongo>=4.13.0"],
+        "json": ["orjson>=3.9.0"],
         "sqlite": [],
         "redis": ["redis"],
         "rabbitmq": ["pika>=1.3.0"],
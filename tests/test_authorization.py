@@ -0,0 +1,81 @@
+import pytest
+from flask import Flask
+
+import basic4web.config as base_config
+from basic4web.controllers.base_controller import has_any_authority
+from basic4web.middleware import authorization
+from basic4web.middleware.jwt import jwt_create_access_token
+
+
+@pytest.fixture
+def config():
+    saved = dict(base_config._config)
+
+    def init(**overrides):
+        base_config.init(overrides)
+
+    yield init
+    base_config._config.clear()
+    base_config._config.update(saved)
+    authorization.refresh_settings()
+
+
+@pytest.fixture
+def client():
+    app = Flask(__name__)
+
+    @app.route("/protected")
+    @has_any_authority(["read"])
+    def protected():
+        return {"ok": True}
+
+    return app.test_client()
+
+
+def _auth(authorities):
+    return {"Authorization": f"Bearer {jwt_create_access_token('u1', {}, authorities)}"}
+
+
+def test_security_enabled_is_read_from_config(config):
+    config(SECURITY_ENABLED=True, API_KEY="k")
+    assert authorization.settings()["security_enabled"] is True
+    assert authorization.settings()["api_key"] == "k"
+    config(SECURITY_ENABLED=False)
+    assert authorization.settings()["security_enabled"] is False
+
+
+def test_protected_endpoint_denies_without_authority(config, client):
+    config(SECURITY_ENABLED=True)
+    assert client.get("/protected").status_code == 403
+    assert client.get("/protected", headers=_auth(["write"])).status_code == 403
+    assert client.get("/protected", headers=_auth(["read"])).status_code == 200
+
+
+@pytest.mark.parametrize(
+    "authorities, hierarchy, granted",
+    [
+        # the role implying "read" has no bit
+        (["read", "write"], {"superuser": ["read"]}, ["superuser"]),
+        # one of the implied authorities has no bit
+        (["admin", "read"], {"admin": ["read", "audit"]}, ["admin"]),
+    ],
+)
+def test_mask_path_matches_set_path(config, client, authorities, hierarchy, granted):
+    config(SECURITY_ENABLED=True, AUTHORITIES=authorities, ROLE_HIERARCHY=hierarchy)
+    policy = authorization.Policy(["read"])
+    token = _auth(granted)
+    expanded = authorization.expand_authorities(granted)
+    payload = {"authorities": granted, "amask": authorization.authority_mask_claim(granted)}
+    assert policy.allows(expanded)
+    assert policy.allows(expanded, authorization.granted_mask(payload, expanded))
+    assert client.get("/protected", headers=token).status_code == 200
+
+
+def test_policy_recompiles_when_authorities_change(config, client):
+    config(SECURITY_ENABLED=True, AUTHORITIES=["read", "write"])
+    assert client.get("/protected", headers=_auth(["read"])).status_code == 200
+    generation = authorization.settings()["generation"]
+    config(AUTHORITIES=["write", "read"])
+    assert authorization.settings()["generation"] == generation + 1
+    assert client.get("/protected", headers=_auth(["write"])).status_code == 403
+    assert client.get("/protected", headers=_auth(["read"])).status_code == 200
@@ -0,0 +1,34 @@
+import json
+from datetime import date, datetime, timezone
+
+import pytest
+from bson import ObjectId
+from flask import Flask
+
+from basic4web.middleware.json_provider import FastJSONProvider, init_json_provider
+
+pytest.importorskip("orjson")
+
+
+@pytest.fixture
+def app():
+    app = Flask(__name__)
+    init_json_provider(app)
+    return app
+
+
+def test_orjson_matches_stdlib(app):
+    payload = {
+        "naive": datetime(2024, 5, 1, 12, 30, 15, 120),
+        "aware": datetime(2024, 5, 1, 12, 30, tzinfo=timezone.utc),
+        "day": date(2024, 5, 1),
+        "id": ObjectId("65f1a0c2e4b0a1b2c3d4e5f6"),
+        "raw": b"\x00\x01",
+        "nested": [{"at": datetime(1999, 12, 31)}],
+    }
+    provider = app.json
+    stdlib = FastJSONProvider(app)
+    stdlib.use_orjson = False
+    assert provider.use_orjson
+    assert json.loads(provider.dumpb(payload)) == json.loads(stdlib.dumpb(payload))
+    assert json.loads(provider.dumps(payload)) == json.loads(stdlib.dumps(payload))
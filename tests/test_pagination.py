@@ -0,0 +1,51 @@
+import base64
+import json
+from datetime import datetime
+
+import pytest
+from bson import ObjectId
+from flask import Flask
+from werkzeug.exceptions import HTTPException
+
+from basic4web.controllers.base_controller import get_pagination
+from basic4web.repository.pagination import decode_cursor, encode_cursor
+
+
+def _token(values):
+    return base64.urlsafe_b64encode(json.dumps(values).encode()).decode().rstrip("=")
+
+
+def test_cursor_round_trip():
+    values = [datetime(2024, 1, 1, 12), ObjectId("65f1a0c2e4b0a1b2c3d4e5f6")]
+    assert decode_cursor(encode_cursor(values)) == values
+    assert decode_cursor(encode_cursor(["name", 3])) == ["name", 3]
+
+
+@pytest.mark.parametrize(
+    "values",
+    [[{"$ne": None}, 1], [{"$date": "2024-01-01", "$gt": 1}], [[1]], [], [1, 2, 3], {"a": 1}],
+)
+def test_cursor_rejects_non_scalars(values):
+    with pytest.raises(ValueError):
+        decode_cursor(_token(values))
+
+
+@pytest.mark.parametrize(
+    "query",
+    [
+        "size=10&after=not-a-cursor",
+        "size=x&page=1",
+        "size=10&page=1&count=bogus",
+        f"size=10&after={_token([{'$ne': None}, 1])}",
+    ],
+)
+def test_invalid_pagination_is_a_400(query):
+    with Flask(__name__).test_request_context(f"/?{query}"):
+        with pytest.raises(HTTPException) as e:
+            get_pagination()
+    assert e.value.response.status_code == 400
+
+
+def test_valid_pagination():
+    with Flask(__name__).test_request_context("/?size=10&page=2&count=none"):
+        assert get_pagination() == {"per_page": 10, "page": 2, "count": "none"}
@@ -0,0 +1,109 @@
+import threading
+
+import pytest
+
+from basic4web.repository import pool as pool_module
+from basic4web.repository.pool import ConnectionPool
+
+
+class FakeConnection:
+    def __init__(self, n):
+        self.n = n
+        self.closed = False
+        self.alive = True
+        self.log = []
+
+    def begin(self):
+        self.log.append("begin")
+
+    def commit(self):
+        self.log.append("commit")
+
+    def rollback(self):
+        self.log.append("rollback")
+
+    def close(self):
+        self.closed = True
+
+
+class Factory:
+    def __init__(self):
+        self.created = []
+        self.fail = False
+
+    def __call__(self):
+        if self.fail:
+            raise ConnectionError("db down")
+        conn = FakeConnection(len(self.created))
+        self.created.append(conn)
+        return conn
+
+
+def ping(conn):
+    if not conn.alive:
+        raise ConnectionError("gone")
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(pool_module.time, "monotonic", lambda: now[0])
+    return now
+
+
+def test_fill_failure_leaves_no_reservation():
+    factory = Factory()
+    pool = ConnectionPool(factory, min_size=3, max_size=3, timeout=0.1)
+    factory.fail = True
+    with pytest.raises(ConnectionError):
+        pool.acquire()
+    assert pool._opening == 0
+    factory.fail = False
+    conns = [pool.acquire() for _ in range(3)]
+    assert len({id(c) for c in conns}) == 3
+    assert pool.stats() == {"size": 3, "idle": 0, "max_size": 3}
+
+
+def test_expired_connection_is_recycled(clock):
+    factory = Factory()
+    pool = ConnectionPool(factory, min_size=1, max_size=1, max_lifetime=60)
+    first = pool.acquire()
+    pool.release(first)
+    clock[0] += 61
+    second = pool.acquire()
+    assert second is not first and first.closed
+    assert pool.stats()["size"] == 1
+
+
+def test_dead_idle_connection_is_replaced_after_ping(clock):
+    factory = Factory()
+    pool = ConnectionPool(factory, min_size=1, max_size=1, ping=ping, ping_interval=5)
+    first = pool.acquire()
+    pool.release(first)
+    first.alive = False
+    clock[0] += 1
+    assert pool.acquire() is first  # recently used: no ping
+    pool.release(first)
+    clock[0] += 10
+    second = pool.acquire()
+    assert second is not first and first.closed
+
+
+def test_transaction_binds_connection_to_thread():
+    factory = Factory()
+    pool = ConnectionPool(factory, min_size=1, max_size=2)
+    seen = []
+    with pool.transaction() as conn:
+        assert pool.acquire() is conn
+        with pool.transaction() as inner:
+            assert inner is conn
+        thread = threading.Thread(target=lambda: seen.append(pool.acquire()))
+        thread.start()
+        thread.join()
+    assert seen[0] is not conn
+    assert conn.log == ["begin", "commit"]
+    with pytest.raises(ValueError):
+        with pool.transaction() as conn:
+            raise ValueError("rollback")
+    assert conn.log[-1] == "rollback"
+    assert not pool.in_transaction()
@@ -0,0 +1,30 @@
+import pytest
+from flask import Flask
+
+from basic4web.controllers.base_controller import cached_response, response_data
+from basic4web.middleware.response_cache import init_response_cache
+
+
+@pytest.fixture
+def client():
+    init_response_cache()
+    app = Flask(__name__)
+
+    @app.route("/versioned")
+    @cached_response(ttl=60)
+    def versioned():
+        resp = response_data({"a": 1}, version="v1", max_age=30)
+        resp.headers["Content-Disposition"] = "inline"
+        return resp
+
+    yield app.test_client()
+    init_response_cache()
+
+
+def test_hit_keeps_view_headers(client):
+    first = client.get("/versioned")
+    hit = client.get("/versioned")
+    for header in ("ETag", "Cache-Control", "Content-Disposition"):
+        assert hit.headers[header] == first.headers[header]
+    assert hit.headers["Content-Length"] == first.headers["Content-Length"]
+    assert client.get("/versioned", headers={"If-None-Match": first.headers["ETag"]}).status_code == 304
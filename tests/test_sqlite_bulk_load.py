@@ -0,0 +1,14 @@
+from basic4web.repository.sqlite3_base_dao import SQLite3DAO
+
+
+def test_bad_rows_are_reported_not_raised(tmp_path):
+    with SQLite3DAO(str(tmp_path), "t") as dao:
+        dao.ddl("CREATE TABLE t (_id INTEGER PRIMARY KEY, name TEXT NOT NULL)")
+        rows = [{"_id": i, "name": f"n{i}"} for i in range(1, 7)]
+        rows += [{"_id": 7}, {"_id": 8, "name": "x", "extra": 1}, {"_id": 9, "name": None}, {"_id": 10, "name": "ok"}]
+        report = dao.bulk_load(iter(rows), chunk_size=4)
+        assert report["loaded"] == 7
+        assert report["chunks"] == 3
+        assert [f["index"] for f in report["failed"]] == [6, 7, 8]
+        assert report["failed"][0]["row"] == {"_id": 7}
+        assert dao._read_conn().execute("SELECT COUNT(*) FROM t").fetchone()[0] == 7
@@ -0,0 +1,55 @@
+import os
+import signal
+
+import pytest
+
+from basic4web.repository import sqlite3_base_dao
+from basic4web.repository.sqlite3_base_dao import SQLite3DAO
+
+
+@pytest.fixture
+def dao(tmp_path):
+    dao = SQLite3DAO(str(tmp_path), "t", concurrent=True)
+    dao.connect()
+    dao._write(lambda conn: conn.execute("CREATE TABLE t (_id INTEGER PRIMARY KEY, name TEXT)"))
+    yield dao
+    sqlite3_base_dao.close_writers()
+
+
+def test_write_after_close_writers_reopens(dao):
+    writer = dao._writer
+    sqlite3_base_dao.close_writers()
+    with pytest.raises(RuntimeError):
+        writer.submit(lambda conn: None)
+    dao.persist({"name": "a"})
+    assert dao._writer is not writer
+    assert dao.get_by_id(1)["name"] == "a"
+
+
+def test_failing_job_only_fails_its_caller(dao):
+    def boom(conn):
+        conn.execute("INSERT INTO t (name) VALUES ('lost')")
+        raise ValueError("boom")
+
+    with pytest.raises(ValueError):
+        dao._write(boom)
+    dao.persist({"name": "kept"})
+    names = [r["name"] for r in dao._read_conn().execute("SELECT name FROM t")]
+    assert names == ["kept"]
+
+
+@pytest.mark.skipif(not hasattr(os, "fork"), reason="needs fork()")
+def test_write_in_forked_child(dao):
+    dao.persist({"name": "parent"})
+    pid = os.fork()
+    if pid == 0:
+        signal.alarm(10)
+        try:
+            dao.persist({"name": "child"})
+            code = 0
+        except BaseException:
+            code = 1
+        os._exit(code)
+    _, status = os.waitpid(pid, 0)
+    assert os.WIFEXITED(status) and os.WEXITSTATUS(status) == 0
+    assert dao.get_by_id(2)["name"] == "child"